@@ -102,6 +102,9 @@ def unregister():
     from .handlers import unload_handlers  
     unload_handlers()
 
+    from .utils.audio_utils import stop_workers
+    stop_workers()
+
     from .properties import unload_properties
     unload_properties()
 
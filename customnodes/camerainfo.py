@@ -8,6 +8,15 @@ import bpy
 from ..__init__ import get_addon_prefs
 from ..utils.str_utils import word_wrap
 from ..utils.node_utils import create_new_nodegroup, set_socket_defvalue
+from ..utils.depsgraph_utils import get_id_key
+from ..utils.perf_utils import measure_node
+from ..utils.cache_utils import get_frame_values, invalidate_frame_cache
+from ..utils.bake_utils import apply_baked_row
+from ..utils.registry_utils import get_all_instances, register_instance, unregister_instance, tag_registry_dirty, get_node_key
+
+
+#blender tags the scene for an update on almost any edit, we compare the few scene settings our nodes read instead
+_SCENE_STATES = {} #{node_key:(camera name_full, resolution_x, resolution_y),} as read by the last update
 
 
 class NODEBOOSTER_NG_camerainfo(bpy.types.GeometryNodeCustomGroup):
@@ -17,6 +26,7 @@ class NODEBOOSTER_NG_camerainfo(bpy.types.GeometryNodeCustomGroup):
 
     bl_idname = "GeometryNodeNodeBoosterCameraInfo"
     bl_label = "Camera info"
+    bake_width = 7 #number of values baked per frame, see bake_utils.py
 
     use_scene_cam: bpy.props.BoolProperty(
         default=True,
@@ -62,30 +72,116 @@ class NODEBOOSTER_NG_camerainfo(bpy.types.GeometryNodeCustomGroup):
         self.node_tree = ng
         self.label = self.bl_label
 
+        register_instance(self)
+
         return None
 
     def copy(self, node):
         """fct run when dupplicating the node"""
         
         self.node_tree = node.node_tree.copy()
+
+        #our copy might not have its final name yet, we let the registry rebuild itself
+        tag_registry_dirty()
         
         return None
 
+    def free(self):
+        """when user delete the node we need to clean up"""
+
+        unregister_instance(self)
+        _SCENE_STATES.pop(get_node_key(self), None)
+
+        return None
+
     def update(self):
         """generic update function"""
 
+        self.update_outputs()
+
+        return None
+
+    def get_output_values(self) -> tuple|None:
+        """gather the camera outputs values, except for the camera object, None if there's no camera"""
+
+        scene = bpy.context.scene
+        cam_obj = scene.camera if (self.use_scene_cam) else self.camera_obj
+        if not (cam_obj and cam_obj.data):
+            return None
+
+        return (
+            cam_obj.data.angle,
+            cam_obj.data.shift_x,
+            cam_obj.data.shift_y,
+            cam_obj.data.clip_start,
+            cam_obj.data.clip_end,
+            scene.render.resolution_x,
+            scene.render.resolution_y,
+            )
+
+    def get_scene_state(self) -> tuple:
+        """the scene settings read by this node, see is_dependent()"""
+
+        scene = bpy.context.scene
+        cam_obj = scene.camera if (self.use_scene_cam) else self.camera_obj
+
+        return (cam_obj.name_full if (cam_obj) else None, scene.render.resolution_x, scene.render.resolution_y)
+
+    def update_outputs(self, frame_key=None,):
+        """update the outputs values, if a frame key is given, the values are read from the frame cache when possible"""
+
+        _SCENE_STATES[get_node_key(self)] = self.get_scene_state()
+
         scene = bpy.context.scene
         cam_obj = scene.camera if (self.use_scene_cam) else self.camera_obj
+
+        #the object pointer is never cached, it could be freed
         set_socket_defvalue(self.node_tree, 0, value=cam_obj)
-        
-        if (cam_obj and cam_obj.data):
-            set_socket_defvalue(self.node_tree, 1, value=cam_obj.data.angle)
-            set_socket_defvalue(self.node_tree, 2, value=cam_obj.data.shift_x)
-            set_socket_defvalue(self.node_tree, 3, value=cam_obj.data.shift_y)
-            set_socket_defvalue(self.node_tree, 4, value=cam_obj.data.clip_start)
-            set_socket_defvalue(self.node_tree, 5, value=cam_obj.data.clip_end)
-            set_socket_defvalue(self.node_tree, 6, value=scene.render.resolution_x)
-            set_socket_defvalue(self.node_tree, 7, value=scene.render.resolution_y)
+
+        if (cam_obj is None):
+            return None
+
+        #the camera might be switched by markers, or by the user
+        if (frame_key is not None):
+            frame_key = (*frame_key, cam_obj.name)
+
+        values = get_frame_values(self, frame_key, self.get_output_values)
+        if (values is not None):
+            self.set_output_values(values)
+
+        return None
+
+    def set_output_values(self, values,):
+        """assign the values gathered by get_output_values(), from a previous evaluation, the cache or a bake"""
+
+        *floats, resx, resy = values
+        for i,v in enumerate(floats, start=1):
+            set_socket_defvalue(self.node_tree, i, value=v)
+        set_socket_defvalue(self.node_tree, 6, value=int(resx))
+        set_socket_defvalue(self.node_tree, 7, value=int(resy))
+
+        return None
+
+    def get_bake_signature(self) -> str:
+        """the baked values are only valid for the same node settings"""
+
+        cam_name = self.camera_obj.name if (self.camera_obj and not self.use_scene_cam) else ""
+
+        return f"{self.bl_idname}|{self.use_scene_cam}|{cam_name}"
+
+    def get_bake_row(self) -> tuple|None:
+        """the numeric values we can bake for the current frame, see bake_utils.py"""
+
+        return self.get_output_values()
+
+    def set_bake_row(self, row,):
+        """assign the baked values, the object pointer is never baked"""
+
+        scene = bpy.context.scene
+        cam_obj = scene.camera if (self.use_scene_cam) else self.camera_obj
+        set_socket_defvalue(self.node_tree, 0, value=cam_obj)
+
+        self.set_output_values(row)
 
         return None
 
@@ -109,12 +205,48 @@ class NODEBOOSTER_NG_camerainfo(bpy.types.GeometryNodeCustomGroup):
 
         return None
         
+    def is_dependent(self, updated_ids) -> bool:
+        """check if any of the updated IDs keys are used by this node (scene render settings, camera object or data).
+        the scene key is ignored, we check if the camera or the resolution changed since our last update instead,
+        it's cheap, and also catch the node camera pointer changes"""
+
+        scene = bpy.context.scene
+        if (_SCENE_STATES.get(get_node_key(self))!=self.get_scene_state()):
+            return True
+
+        cam_obj = scene.camera if (self.use_scene_cam) else self.camera_obj
+        if (cam_obj is None):
+            return False
+        if (get_id_key(cam_obj) in updated_ids):
+            return True
+        if (cam_obj.data and (get_id_key(cam_obj.data) in updated_ids)):
+            return True
+
+        return False
+
+    @classmethod
+    def invalidate_frame_caches(cls, updated_ids,):
+        """forget about the cached frames of the nodes depending on the given updated IDs keys"""
+
+        for n in get_all_instances(cls.bl_idname):
+            if n.is_dependent(updated_ids):
+                invalidate_frame_cache(n)
+
+        return None
+
     @classmethod
-    def update_all_instances(cls, from_depsgraph=False,):
-        """search for all nodes of this type and update them"""
+    def update_all_instances(cls, from_depsgraph=False, updated_ids=None, frame_key=None, bake_frame=None,):
+        """search for all nodes of this type and update them.
+        optionally pass a set of updated IDs keys, only the nodes depending on them will be updated.
+        optionally pass a frame key, the outputs values will be cached for this frame.
+        optionally pass a bake frame, the outputs values will be read from the bake file if possible"""
         
-        all_instances = [n for ng in bpy.data.node_groups for n in ng.nodes if (n.bl_idname==cls.bl_idname)]
-        for n in all_instances:
-            n.update()
+        for n in get_all_instances(cls.bl_idname):
+            if (updated_ids is not None) and (not n.is_dependent(updated_ids)):
+                continue
+            if (bake_frame is not None) and apply_baked_row(n, bake_frame):
+                continue
+            with measure_node(n):
+                n.update_outputs(frame_key=frame_key)
             
         return None 
@@ -4,12 +4,11 @@
 
 
 # NOTE How does it works?
-# 1- Find the variables or constants with regex
+# 1- Tokenize the expression in a single pass, and find the variables or constants, see tokenize_math_expression()
 # 2- dynamically remove/create sockets accordingly
-# 3- transform the algebric expression into 'function expressions' using 'transform_math_expression'
-# 4- execute the function expression with using exec() with the namespace from nex.nodesetter, which will set the nodes in place.
+# 3- transform the algebric expression into a 'function expression' tree using 'transform_math_tree'
+# 4- walk the tree and call the functions from nex.nodesetter with the sockets, which will set the nodes in place, see build_math_function_tree()
 
-# TODO (?) execute the functions from the 'ast' transformer directly? If **really** needed then.
 # TODO color of the node header should be blue for converter.. how to do that without hacking in the memory??
 
 #TODO add dynamic output type?
@@ -27,11 +26,12 @@
 
 import bpy
 
-import re, ast
+import re, ast, math, operator
+from collections import OrderedDict
 
-from ..utils.str_utils import match_exact_tokens, replace_exact_tokens, is_float_compatible
 from ..utils.node_utils import create_new_nodegroup, create_socket, remove_socket, link_sockets, create_constant_input
 from ..nex.nodesetter import get_mathexp_functions
+from ..utils.perf_utils import timed
 
 
 DIGITS = '0123456789'
@@ -58,147 +58,370 @@ DOCSYMBOLS = {
 #Store the math function used to set the nodetree
 USER_FNAMES = [f.__name__ for f in get_mathexp_functions()]
 
+#The lexer tokens, see tokenize_math_expression()
+TOKENS_PATTERN = re.compile("|".join((
+    r"(?P<NUMBER>[0-9]+(?:\.[0-9]*)?(?![0-9.]))",
+    r"(?P<BADNUMBER>[0-9.]+)",
+    r"(?P<IDENTIFIER>[A-Za-z]+)",
+    f"(?P<IRRATIONAL>[{''.join(IRRATIONALS.keys())}])",
+    f"(?P<SUPERSCRIPT>[{''.join(SUPERSCRIPTS.keys())}]+)",
+    r"(?P<OPERATOR>[-+*/%,])",
+    r"(?P<PAREN>[()])",
+    r"(?P<UNKNOWN>.)",
+    )))
 
-def replace_superscript_exponents(expr: str, algebric_notation:bool=False,) -> str:
-    """convert exponent to ** notation
-    Example: "2ab²" becomes "2(ab**2) or "2ab²" becomes "2a(b**2)" if alrebric_notation
-    """
-    
-    # Pattern for alphanumeric base followed by superscripts.
-    if (algebric_notation):
-          pattern_base = r'([A-Za-z0-9π𝑒φ])([⁰¹²³⁴⁵⁶⁷⁸⁹]+)'
-    else: pattern_base = r'([A-Za-z0-9π𝑒φ]+)([⁰¹²³⁴⁵⁶⁷⁸⁹]+)'
-        
-    def repl_base(match):
-        base = match.group(1)
-        superscripts = match.group(2)
-        # Convert each superscript character to its digit equivalent.
-        exponent = "".join(SUPERSCRIPTS.get(ch, '') for ch in superscripts)
-        # Wrap the base in parentheses and apply the power operator.
-        return f"({base}**{exponent})"
-    
-    # Pattern for a closing parenthesis immediately followed by superscripts.
-    pattern_paren = r'(\))([⁰¹²³⁴⁵⁶⁷⁸⁹]+)'
-    
-    def repl_parenthesis(match):
-        closing = match.group(1)
-        superscripts = match.group(2)
-        exponent = "".join(SUPERSCRIPTS.get(ch, '') for ch in superscripts)
-        # Just insert ** before the exponent after the parenthesis.
-        return f"){f'**{exponent}'}"
-    
-    expr = re.sub(pattern_base, repl_base, expr)
-    expr = re.sub(pattern_paren, repl_parenthesis, expr)
-    return expr
+#The functions we can evaluate at compile time, when their arguments are all constants, see optimize_function_tree()
+FOLDABLE_FUNCTIONS = {
+    'add':operator.add, 'sub':operator.sub, 'mult':operator.mul, 'div':operator.truediv, 'pow':math.pow,
+    'neg':operator.neg, 'abs':abs, 'sqrt':math.sqrt, 'min':min, 'max':max,
+    'floor':math.floor, 'ceil':math.ceil, 'trunc':math.trunc,
+    'sin':math.sin, 'cos':math.cos, 'tan':math.tan, 'rad':math.radians, 'deg':math.degrees,
+    }
 
+#The compiled expressions are shared by all nodes, scripts can create thousands of nodes with the same expression
+COMPILE_CACHE_MAX = 512
+_COMPILED = OrderedDict() #{(expression,algebric,macros,optimize):compiled,}
 
-def get_socket_python_api(node, identifier) -> str:
-    """return a python api string that can be executed from a given node and socket identifier"""
-    
-    idx = None
-    in_out_api = "inputs"
-    for sockets in (node.inputs, node.outputs):
-        for i,s in enumerate(sockets):
-            if (hasattr(s,'identifier') and (s.identifier==identifier)):
-                idx = i
-                if (s.is_output):
-                    in_out_api = "outputs"
-                break
-    
-    assert idx is not None, 'ERROR: get_socket_python_api(): Did not find socket idx..'
-    
-    return f"ng.nodes['{node.name}'].{in_out_api}[{idx}]"
 
+def get_compiled_math_expression(key:tuple) -> dict|None:
+    """return the compiled math expression stored for the given (expression, algebric, macros, optimize) key, if any"""
+
+    compiled = _COMPILED.get(key)
+    if (compiled is not None):
+        _COMPILED.move_to_end(key)
+
+    return compiled
+
+
+def set_compiled_math_expression(key:tuple, compiled:dict):
+    """store a compiled math expression for the given (expression, algebric, macros, optimize) key"""
+
+    _COMPILED[key] = compiled
+    if (len(_COMPILED) > COMPILE_CACHE_MAX):
+        _COMPILED.popitem(last=False)
+
+    return None
+
+
+def tokenize_math_expression(expression:str) -> list:
+    """split the user expression into a list of (type, text) tokens, in a single pass.
+    types are 'NUMBER', 'IDENTIFIER', 'FUNCTION', 'OPERATOR', 'PAREN', 'SUPERSCRIPT' & 'IRRATIONAL'.
+    an identifier is typed 'FUNCTION' if it's one of our functions name, followed by a parenthesis"""
+
+    tokens = []
+
+    for match in TOKENS_PATTERN.finditer(expression):
+        kind, text = match.lastgroup, match.group()
+
+        if (kind=='IDENTIFIER'):
+            if (text in USER_FNAMES) and expression.startswith('(', match.end()):
+                kind = 'FUNCTION'
+
+        elif (kind=='BADNUMBER'):
+            raise Exception(f"Unrecognized Float '{text}'")
+
+        elif (kind=='UNKNOWN'):
+            raise Exception(f"Unauthorized Symbol '{text}'")
+
+        tokens.append((kind, text))
+        continue
+
+    return tokens
+
+
+def walk_function_tree(tree) -> list:
+    """return the nodes of the given expression tree, children always come before their parent.
+    the nodes shared by many branches are only listed once"""
+
+    nodes, seen = [], set()
+    stack = [(tree, False)]
+
+    while stack:
+        node, visited = stack.pop()
+        if (visited):
+            nodes.append(node)
+            continue
+        if (id(node) in seen):
+            continue
+        seen.add(id(node))
+        stack.append((node, True))
+        stack.extend((child, False) for child in ast.iter_child_nodes(node))
+        continue
+
+    return nodes
+
+
+def get_constant(node) -> float|None:
+    """return the value of the given constant node, None if it's not a constant"""
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+
+    return None
+
+
+def optimize_call(node):
+    """return a cheaper equivalent of the given function call node, or the node itself.
+    we fold the constants, merge the constant chains, and apply the algebraic identities"""
+
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+        return node
+
+    fname, args = node.func.id, node.args
+    consts = [get_constant(a) for a in args]
+
+    #a call of constants only is computed right away.
+    #we let blender handle the invalid operations, its math nodes return 0 instead of raising
+    if (fname in FOLDABLE_FUNCTIONS) and args and all(c is not None for c in consts):
+        try:
+            value = float(FOLDABLE_FUNCTIONS[fname](*consts))
+        except (ArithmeticError, ValueError, TypeError):
+            return node
+        if math.isfinite(value):
+            return ast.Constant(value=value)
+        return node
+
+    if (len(args)!=2):
+        return node
+
+    (a, b), (ca, cb) = args, consts
 
-def execute_math_function_expression(customnode=None, expression:str=None, 
-    node_tree=None, varsapi:dict=None, constapi:dict=None,) -> None:
-    """Execute the functions to arrange the node_tree"""
+    match fname:
 
-    # Replace the constants or variable with sockets API
-    # ex 'a' will become 'ng.nodes["foo"].outputs[1]'
-    api_expression = replace_exact_tokens(expression, {**varsapi, **constapi},)
+        case 'add' | 'mult':
+            #merge the constant chains, ex: (x*2)*3 becomes x*6
+            if (ca is not None):
+                (a, b), (ca, cb) = (b, a), (cb, ca)
+            if (cb is not None) and isinstance(a, ast.Call) and isinstance(a.func, ast.Name) and (a.func.id==fname):
+                inner = [get_constant(v) for v in a.args]
+                if (len(a.args)==2) and ((inner[0] is None) != (inner[1] is None)):
+                    x, c = (a.args[1], inner[0]) if (inner[0] is not None) else (a.args[0], inner[1])
+                    merged = (c + cb) if (fname=='add') else (c * cb)
+                    return ast.Call(func=node.func, args=[x, ast.Constant(value=merged)], keywords=[])
+            #move the constants to the end of the chains so they meet, ex: (x*2)*y becomes (x*y)*2
+            if (ca is None) and (cb is None):
+                for x, y in ((a, b), (b, a)):
+                    if isinstance(x, ast.Call) and isinstance(x.func, ast.Name) and (x.func.id==fname) and (len(x.args)==2):
+                        inner = [get_constant(v) for v in x.args]
+                        if ((inner[0] is None) != (inner[1] is None)):
+                            c, v = (x.args[0], x.args[1]) if (inner[0] is not None) else (x.args[1], x.args[0])
+                            chain = simplify_call(ast.Call(func=node.func, args=[v, y], keywords=[]))
+                            return ast.Call(func=node.func, args=[chain, c], keywords=[])
+            #x+0, x*1 & x*0
+            if (fname=='add') and (cb==0):
+                return a
+            if (fname=='mult') and (cb==1):
+                return a
+            if (fname=='mult') and (cb==0):
+                return ast.Constant(value=0.0)
+
+        case 'sub' if (cb is not None):
+            #x-0, or x-c becomes x+(-c), so it can join an addition chain
+            if (cb==0):
+                return a
+            return ast.Call(func=ast.Name(id='add', ctx=ast.Load()), args=[a, ast.Constant(value=-cb)], keywords=[])
+
+        case 'div' if (cb==1):
+            return a
+
+        case 'pow':
+            if (cb==1):
+                return a
+            #cheaper nodes, x*x & sqrt(x)
+            if (cb==2):
+                return ast.Call(func=ast.Name(id='mult', ctx=ast.Load()), args=[a, a], keywords=[])
+            if (cb==0.5):
+                return ast.Call(func=ast.Name(id='sqrt', ctx=ast.Load()), args=[a], keywords=[])
+
+    return node
+
+
+def simplify_call(node):
+    """optimize the given node until nothing can be simplified anymore, each simplification might allow another one.
+    ex: (x*2)*0.5 becomes x*1, then x"""
+
+    simplest, new = node, optimize_call(node)
+    while (new is not simplest):
+        simplest, new = new, optimize_call(new)
+
+    return simplest
+
+
+def optimize_function_tree(tree):
+    """simplify the given function expression tree from the leaves to the root, see optimize_call()"""
+
+    optimized = {} #{id(node):node,}
+
+    for node in walk_function_tree(tree):
+
+        if isinstance(node, ast.Call):
+            node.args = [optimized.get(id(a), a) for a in node.args]
+
+        optimized[id(node)] = simplify_call(node)
+        continue
+
+    return optimized.get(id(tree), tree)
+
+
+def eliminate_common_subexpressions(tree) -> tuple:
+    """merge the structurally identical function calls of the given expression tree, so they are only built once.
+    the calls are numbered from the leaves to the root, two calls sharing the same function and arguments numbers
+    are the same. return the (tree, number of calls saved)"""
+
+    numbers = {} #{id(node):number,}
+    signatures = {} #{signature:number,}
+    canonicals = {} #{number:node,}
+    calls = 0
+
+    # children always come before their parent, so their numbers are known
+    for node in walk_function_tree(tree):
+
+        match node:
+
+            case ast.Call() if isinstance(node.func, ast.Name):
+                calls += 1
+                node.args = [canonicals[numbers[id(a)]] for a in node.args]
+                signature = (node.func.id, *(numbers[id(a)] for a in node.args))
+
+            case ast.Name():
+                signature = ('NAME', node.id)
+
+            case ast.Constant():
+                signature = ('CONSTANT', node.value)
+
+            case _:
+                #anything else is kept as is, it will be refused when building
+                signature = ('UNIQUE', id(node))
+
+        number = signatures.setdefault(signature, len(signatures))
+        canonicals.setdefault(number, node)
+        numbers[id(node)] = number
+        continue
+
+    saved = calls - sum(1 for n in canonicals.values() if isinstance(n, ast.Call) and isinstance(n.func, ast.Name))
+
+    return canonicals[numbers[id(tree)]], saved
+
+
+def build_math_function_tree(customnode=None, tree=None, 
+    node_tree=None, varsockets:dict=None, constsockets:dict=None,) -> None:
+    """Walk the transformed expression tree, and call our functions with the sockets to arrange the node_tree.
+    the tree is walked depth first, from left to right, the same order python would evaluate the function expression.
+    a call shared by many branches of the tree is only built once, see eliminate_common_subexpressions()"""
 
     user_functions_partials = get_mathexp_functions(default_ng=node_tree)
     user_function_namespace = {f.func.__name__:f for f in user_functions_partials}
-    
-    # Define the namespace of the execution, and include our functions
-    local_vars = {}
-    local_vars["ng"] = node_tree
-    local_vars.update(user_function_namespace)
-    
-    # we get rid of any blender builtin functions
-    global_vars = {"__builtins__": {}}
 
-    try:
-        # TODO port this to ast, only if the extension patform accepts the other py evaluation nodes relying on exec and eval
-        exec(api_expression, global_vars, local_vars)
-
-    except TypeError as e:
-        print(f"TypeError: execute_math_function_expression():\n  {e}\nOriginalExpression:\n  {expression}\nApiExpression:\n  {api_expression}\n")
-
-        #Cook better error message to end user
-        e = str(e)
-        if ('()' in e):
-            fname = e.split('()')[0]
-            if ('() missing' in e) and ('required positional argument' in e):
-                nbr = e.split('() missing ')[1][0]
-                raise Exception(f"Function '{fname}' needs {nbr} more Params")                    
-            elif ('() takes' in e) and ('positional argument' in e):
-                raise Exception(f"Function '{fname}' recieved Extra Params")
-        
-        raise Exception("Wrong Arguments Given")
+    values = []
+    built = {} #{id(call):socket,}
+    stack = [(tree, False)]
 
-    except Exception as e:
-        print(f"{type(e).__name__}: execute_math_function_expression():\n  {e}\nOriginalExpression:\n  {expression}\nApiExpression:\n  {api_expression}\n")
+    while stack:
+        node, visited = stack.pop()
 
-        #Cook better error message to end user
-        if ("'tuple' object" in str(e)):
-            raise Exception("Wrong use of '( , )' Synthax")
-        #User really need to have a VERY LONG expression to reach to that point..
-        if ('too many nested parentheses' in str(e)):
-            raise Exception("Expression too Large")
-        
-        raise Exception("Error on Execution")
-    
-    # When executing, the last one created should be the active node, 
-    # We still need to connect it to the ng output
+        match node:
+
+            case ast.Call():
+                # this call was already built for another branch
+                if (id(node) in built):
+                    values.append(built[id(node)])
+                    continue
+
+                # we evaluate the arguments first, then call the function with their results
+                if (not visited):
+                    stack.append((node, True))
+                    stack.extend((arg, False) for arg in reversed(node.args))
+                    continue
+
+                if (not isinstance(node.func, ast.Name)):
+                    raise Exception("Math Expression Not Recognized")
+
+                args = values[len(values)-len(node.args):]
+                del values[len(values)-len(node.args):]
+
+                try:
+                    values.append(user_function_namespace[node.func.id](*args))
+                    built[id(node)] = values[-1]
+
+                except TypeError as e:
+                    print(f"TypeError: build_math_function_tree():\n  {e}\nFunction:\n  {node.func.id}{tuple(args)}\n")
+
+                    #Cook better error message to end user
+                    e = str(e)
+                    if ('()' in e):
+                        fname = e.split('()')[0]
+                        if ('() missing' in e) and ('required positional argument' in e):
+                            nbr = e.split('() missing ')[1][0]
+                            raise Exception(f"Function '{fname}' needs {nbr} more Params")                    
+                        elif ('() takes' in e) and ('positional argument' in e):
+                            raise Exception(f"Function '{fname}' recieved Extra Params")
+
+                    raise Exception("Wrong Arguments Given")
+
+                except Exception as e:
+                    print(f"{type(e).__name__}: build_math_function_tree():\n  {e}\nFunction:\n  {node.func.id}{tuple(args)}\n")
+                    raise Exception("Error on Execution")
+
+            case ast.Name():
+                values.append(varsockets[node.id])
+
+            case ast.Constant():
+                values.append(constsockets.get(node.value, node.value))
+
+            case ast.Tuple():
+                raise Exception("Wrong use of '( , )' Synthax")
+
+            case _:
+                raise Exception("Math Expression Not Recognized")
+
+        continue
+
+    # The root of the tree gives us the socket to connect to the ng output,
+    # it might be a variable or constant socket, if the user only inputed one, or if the expression was simplified
     try:
-        last = node_tree.nodes.active
-        
-        #this can only mean one thing, the user only inputed one single variable or constant
-        if (last is None):
-            if (customnode.elemVar):
-                last = node_tree.nodes['Group Input']
-            elif (customnode.elemConst):
-                for n in node_tree.nodes:
-                    if (n.type=='VALUE'):
-                        last = n
-                        break
+        sock1 = values[-1]
+        last = sock1.node
             
         out_node = node_tree.nodes['Group Output']
         out_node.location = (last.location.x+last.width+70, last.location.y-120,)
         
-        sock1, sock2 = last.outputs[0], out_node.inputs[0]
+        sock2 = out_node.inputs[0]
         link_sockets(sock1, sock2)
         
     except Exception as e:
-        print(f"{type(e).__name__} FinalLinkError: execute_math_function_expression():\n  {e}")
+        print(f"{type(e).__name__} FinalLinkError: build_math_function_tree():\n  {e}")
         raise Exception("Error on Final Link")
     
     return None     
 
 
 class FunctionTransformer(ast.NodeTransformer):
-    """AST Transformer for converting math expressions into function-call expressions."""
+    """AST Transformer for converting math expressions into function-call expressions.
+    the nodes are transformed from the leaves to the root without recursion, as long expressions are deeply nested"""
 
     def __init__(self):
         super().__init__()
         self.functions_used = set()
+
+    def visit(self, tree):
+        # children always come after their parent in a breadth first walk, we transform them in reverse order
+        transformed = {}
+        for node in reversed(list(ast.walk(tree))):
+
+            for field, old in ast.iter_fields(node):
+                if isinstance(old, list):
+                    setattr(node, field, [transformed.get(id(v), v) for v in old])
+                elif isinstance(old, ast.AST):
+                    setattr(node, field, transformed.get(id(old), old))
+
+            visitor = getattr(self, 'visit_' + node.__class__.__name__, None)
+            if (visitor is not None):
+                transformed[id(node)] = visitor(node)
+            continue
+
+        return transformed.get(id(tree), tree)
     
     def visit_BinOp(self, node):
-        # First, process child nodes.
-        self.generic_visit(node)
-        
         # Map ast operators and transform to supported function names
         match node.op:
             case ast.Add():
@@ -229,8 +452,6 @@ class FunctionTransformer(ast.NodeTransformer):
         )
 
     def visit_UnaryOp(self, node):
-        # Process child nodes first.
-        self.generic_visit(node)
         # Detect unary minus.
         if isinstance(node.op, ast.USub):
             self.functions_used.add('neg')
@@ -247,7 +468,6 @@ class FunctionTransformer(ast.NodeTransformer):
         # Record called function names.
         if isinstance(node.func, ast.Name):
             self.functions_used.add(node.func.id)
-        self.generic_visit(node)
         return node
 
     def visit_Name(self, node):
@@ -259,14 +479,18 @@ class FunctionTransformer(ast.NodeTransformer):
     def visit_Constant(self, node):
         return node
 
-    def transform_math_expression(self, math_express: str) -> str:
-        """Transforms a math expression into a function-call expression.
-        Example: 'x*2 + (3-4/5)/3 + (x+y)**2' becomes 'add(mult(x,2),div(sub(3,div(4,5)),3),exp(add(x,y),2))'"""
+    def transform_math_tree(self, math_express: str) -> ast.expr:
+        """Transforms a math expression into a function-call expression tree.
+        Example: 'x*2 + (3-4/5)/3 + (x+y)**2' becomes the tree of 'add(mult(x,2),div(sub(3,div(4,5)),3),exp(add(x,y),2))'"""
         
         # Use the ast module to visit our equation
         try:
             tree = ast.parse(math_express, mode='eval')
             transformed_node = self.visit(tree.body)
+        except RecursionError as e:
+            #User really need to have a VERY LONG expression to reach to that point..
+            print(f"FunctionTransformer ParsingError {type(e).__name__}:\n  Expression: `{math_express}`\n{e}")
+            raise Exception("Expression too Large")
         except Exception as e:
             print(f"FunctionTransformer ParsingError {type(e).__name__}:\n  Expression: `{math_express}`\n{e}")
             raise Exception("Math Expression Not Recognized")
@@ -277,8 +501,14 @@ class FunctionTransformer(ast.NodeTransformer):
                 print(f"FunctionTransformer NamespaceError:\n  Element '{fname}' not in available functions.\n  Expression: `{math_express}`")
                 raise Exception(f"Unknown Function '{fname}'")
         
+        return transformed_node
+
+    def transform_math_expression(self, math_express: str) -> str:
+        """Transforms a math expression into a function-call expression.
+        Example: 'x*2 + (3-4/5)/3 + (x+y)**2' becomes 'add(mult(x,2),div(sub(3,div(4,5)),3),exp(add(x,y),2))'"""
+
         # Then transform the ast into a function call sequence
-        func_express = str(ast.unparse(transformed_node))
+        func_express = str(ast.unparse(self.transform_math_tree(math_express)))
         return func_express
 
 
@@ -305,6 +535,10 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         name="Number of nodes in the nodetree",
         default=-1,
         )
+    debug_nodes_saved : bpy.props.IntProperty(
+        name="Number of nodes saved by reusing identical subexpressions",
+        default=0,
+        )
 
     def update_signal(self,context):
         """evaluate user expression and change the sockets implicitly"""
@@ -329,6 +563,12 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         update=update_signal,
         description="Recognize Macros.\nAutomatically recognize the strings 'Pi' 'eNum' 'Gold' and replace them with their unicode symbols.",
         )
+    use_optimize : bpy.props.BoolProperty(
+        default=False,
+        name="Optimize",
+        update=update_signal,
+        description="Optimize.\nCompute the constant parts of the expression right away, and simplify it, ex: '2*3*a + 0' becomes 'a*6', 'x**2' becomes 'x*x'.\nThe results might differ very slightly, as the operations are computed in a different order.\nNote that 'x*0' becomes 0, even if 'x' is infinite or NaN",
+        )
 
     @classmethod
     def poll(cls, context):
@@ -369,146 +609,125 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         return None
     
     def sanatize_math_expression(self, expression) -> str:
-        """ensure the user expression is correct, sanatized it, and collect its element"""
+        """ensure the user expression is correct, sanatized it, and collect its element.
+        the expression is tokenized in a single pass, then the algebric notation, implicit multiplications
+        & superscripts exponents are rewritten on the tokens stream"""
+
+        algebric = self.use_algrebric_multiplication
 
-        authorized_symbols = ALPHABET + DIGITS + '/*-+%.,()'
-        
         # Remove white spaces char
         expression = expression.replace(' ','')
         expression = expression.replace('	','')
-                
-        # Sanatize ² Notations
-        for char in expression:
-            if char in SUPERSCRIPTS.keys():
-                expression = replace_superscript_exponents(expression,
-                    algebric_notation=self.use_algrebric_multiplication,
-                    )
-                break 
-        
-        # Support for Irrational unicode char
-        mached = match_exact_tokens(expression, IRRATIONALS.keys())
-        if any(mached):
-            expression = replace_exact_tokens(expression, IRRATIONALS)
-        
-        # Gather lists of expression component outside of operand and some synthax elements
-        elemTotal = expression
-        for char in '/*-+%,()':
-            elemTotal = elemTotal.replace(char,'|')
-        self.elemTotal = set(e for e in elemTotal.split('|') if e!='')
-        
-        # Implicit multiplication on parentheses? Need to add '*(' or ')*' then
-        match self.use_algrebric_multiplication:
-            
-            # Is any vars right next to any parentheses? ex: a(ab)²c
-            case True:
-                for e in self.elemTotal:
-                    if (e not in USER_FNAMES):
-                        if match_exact_tokens(expression,f'{e}('):
-                            expression = replace_exact_tokens(expression,{f'{e}(':f'{e}*('})
-                        if match_exact_tokens(expression,f'){e}'):
-                            expression = replace_exact_tokens(expression,{f'){e}':f')*{e}'})
-            
-            # At least Support for implicit math operation on parentheses (ex: '*(' '2(a+b)' or '2.59(c²)')
-            case False:
-                expression = re.sub(r"(\d+(?:\.\d+)?)(\()", r"\1*\2", expression)
-        
+
+        tokens = tokenize_math_expression(expression)
+
+        # Group the adjacent numbers, identifiers & irrationals into elements (ex '2ab' or 'x')
+        items = []
+        for tok in tokens:
+            if (tok[0] in {'NUMBER','IDENTIFIER','FUNCTION','IRRATIONAL'}):
+                if (items and items[-1][0]=='ELEMENT'):
+                      items[-1][1].append(tok)
+                else: items.append(('ELEMENT', [tok]))
+                continue
+            items.append(tok)
+            continue
+
         # Gather and sort our expression elements
-        # they can be either variables, constants, functions, or unrecognized
+        # they can be either variables, constants, functions
         self.elemFct = set()
         self.elemConst = set()
         self.elemVar = set()
-        self.elemComp = set()
 
-        match self.use_algrebric_multiplication:
+        # Each item is rewritten into factors, multiplied together
+        out = []
+        previous = None
+
+        for item in items:
+            kind, value = item
+
+            match kind:
+
+                case 'ELEMENT':
 
-            case True:
-                for e in self.elemTotal:
-                    
                     #we have a function
-                    if (e in USER_FNAMES):
-                        if f'{e}(' in expression:
-                            self.elemFct.add(e)
-                            continue
-                    
-                    #we have float or int?
-                    if (e.replace('.','').isdigit()):
-                        if (not is_float_compatible(e)):
-                            raise Exception(f"Unrecognized Float '{e}'")
-                        self.elemConst.add(e)
-                        continue
-                    
-                    #we have a single char alphabetical variable a,x,E ect..
-                    if (len(e)==1 and (e in ALPHABET)):
-                        self.elemVar.add(e)
-                        continue
-                    
-                    #check if user varnames is ok
-                    for c in list(e):
-                        if (c not in list(authorized_symbols) + list(IRRATIONALS.keys())):
-                            raise Exception(f"Unauthorized Symbol '{c}'")
-                            
-                    # Then it means we have a composite element (ex 2ab)
-                    self.elemComp.add(e)
-                    
+                    if (len(value)==1 and value[0][0]=='FUNCTION'):
+                        self.elemFct.add(value[0][1])
+                        factors = [value[0][1]]
+
                     # Separate our composite into a list of int/float with single alphabetical char
                     # ex 24abc1.5 to [24,a,b,c,1.5]
-                    esplit = [m for match in re.finditer(r'(\d+\.\d+|\d+)|([a-zA-Z])', e) for m in match.groups() if m]
-
-                    # Store the float or int const elems of the composite
-                    for esub in esplit:
-                        if (esub.replace('.','').isdigit()):
-                            self.elemConst.add(esub)
-                        elif (esub.isalpha() and len(esub)==1):
-                            self.elemVar.add(esub)
+                    elif (algebric):
+                        factors = []
+                        for t, v in value:
+                            if (t=='NUMBER'):
+                                self.elemConst.add(v)
+                                factors.append(v)
+                            elif (t=='IRRATIONAL'):
+                                self.elemConst.add(IRRATIONALS[v])
+                                factors.append(IRRATIONALS[v])
+                            else:
+                                self.elemVar.update(v)
+                                factors.extend(v)
+
+                    #we have a float or int, an irrational, or a variable (ex 'ab' or 'x')
+                    elif (len(value)==1):
+                        t, v = value[0]
+                        if (t=='NUMBER'):
+                            self.elemConst.add(v)
+                        elif (t=='IRRATIONAL'):
+                            v = IRRATIONALS[v]
+                            self.elemConst.add(v)
+                        elif (v in USER_FNAMES):
+                            raise Exception(f"Variable '{v}' is Taken")
                         else:
-                            msg = f"Unknown Element '{esub}' of Composite '{e}'"
-                            print(f"Exception: sanatize_math_expression():\n{msg}")
-                            raise Exception(msg)
-                            
-                    # Insert inplicit multiplications
-                    expression = replace_exact_tokens(expression,{e:'*'.join(esplit)})
-                    continue
-                
-            case False:
-                for e in self.elemTotal:
-
-                    #we have a function
-                    if (e in USER_FNAMES):
-                        if f'{e}(' in expression:
-                            self.elemFct.add(e)
-                            continue
-
-                    #we have float or int?
-                    if (e.replace('.','').isdigit()):
-                        if (not is_float_compatible(e)):
-                            raise Exception(f"Unrecognized Float '{e}'")
-                        self.elemConst.add(e)
-                        continue
-
-                    #we have a variable (ex 'ab' or 'x')
-                    if all(c in ALPHABET for c in list(e)):
-                        if (e in USER_FNAMES):
-                            raise Exception(f"Variable '{e}' is Taken")
-                        self.elemVar.add(e)
-                        continue
-
-                    #check for bad symbols
-                    for c in list(e):
-                        if (c not in list(authorized_symbols) + list(IRRATIONALS.keys())):
-                            raise Exception(f"Unauthorized Symbol '{c}'")
+                            self.elemVar.add(v)
+                        factors = [v]
 
                     #unauthorized variable? technically, it's unrecognized
-                    raise Exception(f"Unauthorized Variable '{e}'")
-        
+                    else:
+                        raise Exception(f"Unauthorized Variable '{''.join(t[1] for t in value)}'")
+
+                    # Implicit multiplication after exponents ex: 'a²b' '(a+b)²c', and after parentheses with the algebric notation ex: '(a)b'
+                    if (previous is not None) and (previous[0]=='SUPERSCRIPT' or (algebric and previous==('PAREN',')'))):
+                        out.append('*')
+
+                    out.append(factors)
+
+                case 'SUPERSCRIPT':
+                    # Sanatize ² Notations, ex: 'ab²' become '(ab**2)' or 'a(b**2)' with the algebric notation
+                    exponent = "".join(SUPERSCRIPTS[ch] for ch in value)
+                    self.elemConst.add(exponent)
+                    if (previous is not None) and (previous[0]=='ELEMENT'):
+                        factors = out[-1]
+                        if (algebric):
+                              factors[-1] = f"({factors[-1]}**{exponent})"
+                        else: out[-1] = [f"({'*'.join(factors)}**{exponent})"]
+                    elif (previous==('PAREN',')')):
+                        out.append(f"**{exponent}")
+                    else:
+                        raise Exception(f"Unauthorized Symbol '{value[0]}'")
+
+                case 'PAREN' if (value=='('):
+                    if (previous is not None):
+                        # Algebric notations support any implicit multiplications ex: 'a(b)' '(a)(b)' 'a²(b)'
+                        if (algebric):
+                            if (previous==('PAREN',')') or previous[0]=='SUPERSCRIPT' or (previous[0]=='ELEMENT' and (len(previous[1])>1 or previous[1][0][0]!='FUNCTION'))):
+                                out.append('*')
+                        # At least Support for implicit math operation on parentheses (ex: '*(' '2(a+b)' or '2.59(c²)')
+                        elif (previous[0]=='SUPERSCRIPT' or (previous[0]=='ELEMENT' and previous[1][-1][0] in {'NUMBER','IRRATIONAL'})):
+                            out.append('*')
+                    out.append(value)
+
+                case _:
+                    out.append(value)
+
+            previous = item
+            continue
+
         #Order our variable alphabetically
         self.elemVar = sorted(self.elemVar)
 
-        # Ensure user is using correct symbols #NOTE we do that 3 times already tho.. reperitive.
-        for char in expression:
-            if (char not in authorized_symbols):
-                raise Exception(f"Unauthorized Symbol '{char}'")
-        
-        return expression
+        return "".join(v if isinstance(v,str) else '*'.join(v) for v in out)
     
     def apply_macros_to_math_expression(self, expression) -> str:
         """Replace macros such as 'Pi' 'eNum' or else..  by their values"""
@@ -542,6 +761,49 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
 
         return None
 
+    def compile_math_expression(self, expression) -> dict:
+        """sanatize the user expression and transform it into a function expression, the result doesn't depend
+        on the node instance, only on the expression & the node options, it can be shared with other nodes.
+        return a dict {'sanatized','elemVar','elemConst','fcttree','fctexp','saved','error'}, 'sanatized' or 'fcttree' are None on failure"""
+
+        compiled = {'sanatized':None, 'elemVar':(), 'elemConst':frozenset(), 'fcttree':None, 'fctexp':None, 'saved':0, 'error':"",}
+
+        try:
+            compiled['sanatized'] = self.sanatize_math_expression(expression)
+        except Exception as e:
+            compiled['error'] = str(e)
+            return compiled
+
+        compiled['elemVar'] = tuple(self.elemVar)
+        compiled['elemConst'] = frozenset(self.elemConst)
+
+        # Transform user expression into pure function expression tree
+        try:
+            transformer = FunctionTransformer()
+            compiled['fcttree'] = transformer.transform_math_tree(compiled['sanatized'])
+        except Exception as e:
+            compiled['error'] = str(e)
+            return compiled
+
+        # Simplify the expression, the constants left over are the only ones needing a node
+        if (self.use_optimize):
+            compiled['fcttree'] = optimize_function_tree(compiled['fcttree'])
+            texts = {float(c):c for c in compiled['elemConst']}
+            values = {n.value for n in walk_function_tree(compiled['fcttree']) if (get_constant(n) is not None)}
+            compiled['elemConst'] = frozenset(texts.get(v, repr(float(v))) for v in values)
+
+        # Identical subexpressions only need to be built once
+        compiled['fcttree'], compiled['saved'] = eliminate_common_subexpressions(compiled['fcttree'])
+
+        # The function expression is only displayed for debugging
+        try:
+            compiled['fctexp'] = ast.unparse(compiled['fcttree'])
+        except RecursionError:
+            compiled['fctexp'] = "Too Large to Display"
+
+        return compiled
+
+    @timed('NODE')
     def apply_math_expression(self) -> None:
         """transform the math expression into sockets and nodes arrangements"""
         
@@ -563,17 +825,22 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         # Keepsafe the math expression within the group
         self.store_equation_as_frame(self.user_mathexp)
         
+        # Sanatize & transform the user expression, or reuse the result of a previous compilation
+        key = (self.user_mathexp, self.use_algrebric_multiplication, self.use_macros, self.use_optimize)
+        compiled = get_compiled_math_expression(key)
+        if (compiled is None):
+            compiled = self.compile_math_expression(self.user_mathexp)
+            set_compiled_math_expression(key, compiled)
+
         # First we make sure the user expression is correct
-        try:
-            rval = self.sanatize_math_expression(self.user_mathexp)
-        except Exception as e:
-            self.error_message = str(e)
+        if (compiled['sanatized'] is None):
+            self.error_message = compiled['error']
             self.debug_sanatized = 'Failed'
             return None
         
         # Define the result of sanatize_math_expression
-        sanatized_expr = self.debug_sanatized = rval
-        elemVar, elemConst = self.elemVar, self.elemConst
+        self.debug_sanatized = compiled['sanatized']
+        elemVar, elemConst = self.elemVar, self.elemConst = compiled['elemVar'], compiled['elemConst']
         
         # Clear node tree
         for node in list(ng.nodes).copy():
@@ -595,27 +862,29 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         for idx in reversed(idx_to_del):
             remove_socket(ng, idx, in_out='INPUT')
         
-        # Let's collect equivalence between varnames/const and the pythonAPI
-        vareq, consteq = dict(), dict()
+        # Let's collect equivalence between varnames/const and their sockets
+        varsockets, constsockets = dict(), dict()
         
-        # Fill equivalence dict with it's socket eq
+        # Fill equivalence dict with it's socket
         if (elemVar):
             for s in in_nod.outputs:
                 if (s.name in elemVar):
-                    vareq[s.name] = get_socket_python_api(in_nod, s.identifier)
+                    varsockets[s.name] = s
 
         # Add input for constant right below the vars group input
         if (elemConst):
             xloc, yloc = in_nod.location.x, in_nod.location.y-330
             for const in elemConst:
+                # '2' and '2.0' are the same constant in the expression tree
+                if (float(const) in constsockets):
+                    continue
                 con_sck = create_constant_input(
                     ng, 'ShaderNodeValue', float(const), const,
                     location=(xloc, yloc),
                     )
-                con_nod = con_sck.node
                 yloc -= 90
-                # Also fill const to socket equivalence dict
-                consteq[const] = get_socket_python_api(con_nod, con_sck.identifier)
+                # Also fill const value to socket equivalence dict
+                constsockets[float(const)] = con_sck
                 continue
 
         # Give it a refresh signal, when we remove/create a lot of sockets, the customnode inputs/outputs need a kick
@@ -625,21 +894,18 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         if not (elemVar or elemConst):
             return None
         
-        # Transform user expression into pure function expression
-        try:
-            transformer = FunctionTransformer()
-            fctexp = transformer.transform_math_expression(sanatized_expr)
-        except Exception as e:
-            self.error_message = str(e)
+        # Did the transformation of the user expression into pure function expression failed?
+        if (compiled['fcttree'] is None):
+            self.error_message = compiled['error']
             self.debug_fctexp = 'Failed'
             return None
         
-        self.debug_fctexp = fctexp
+        self.debug_fctexp = compiled['fctexp']
         
-        # Execute the function expression to arrange the user nodetree
+        # Walk the function expression tree to arrange the user nodetree
         try:
-            execute_math_function_expression(
-                customnode=self, expression=fctexp, node_tree=ng, varsapi=vareq, constapi=consteq,
+            build_math_function_tree(
+                customnode=self, tree=compiled['fcttree'], node_tree=ng, varsockets=varsockets, constsockets=constsockets,
                 )
         except Exception as e:
             self.error_message = str(e)
@@ -647,6 +913,7 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         
         #we count the number of nodes
         self.debug_nodes_quantity = len(ng.nodes)
+        self.debug_nodes_saved = compiled['saved']
 
         return None
 
@@ -675,6 +942,9 @@ class NODEBOOSTER_NG_mathexpression(bpy.types.GeometryNodeCustomGroup):
         opt.scale_x = 0.3
         opt.prop(self, "use_macros", text="π", toggle=True, )
 
+        opt = row.row(align=True)
+        opt.prop(self, "use_optimize", text="", icon="SORTTIME", toggle=True, )
+
         if (is_error):
             lbl = col.row()
             lbl.alert = is_error
@@ -13,6 +13,8 @@ from ..__init__ import get_addon_prefs
 from ..resources import cust_icon
 from ..nex.nextypes import NexFactory, NexError, NEXEQUIVALENCE
 from ..utils.str_utils import word_wrap
+from ..utils.perf_utils import timed
+from ..utils.registry_utils import get_all_instances, register_instance, unregister_instance, tag_registry_dirty
 from ..utils.node_utils import (
     get_socket,
     create_socket,
@@ -66,7 +68,6 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
     • WIP text about synthax.
     • WIP text about how it works"""
 
-    #TODO Optimization: node_utils function should check if value or type isn't already set before setting it.
     #TODO maybe should add a nodebooster panel in text editor for quick execution?
 
     bl_idname = "GeometryNodeNodeBoosterNexInterpreter"
@@ -121,6 +122,8 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
         self.width = 185
         self.label = self.bl_label
 
+        register_instance(self)
+
         return None
 
     def copy(self,node,):
@@ -128,6 +131,9 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
 
         self.node_tree = node.node_tree.copy()
 
+        #our copy might not have its final name yet, we let the registry rebuild itself
+        tag_registry_dirty()
+
         return None 
 
     def update(self):
@@ -212,6 +218,7 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
 
         return None
 
+    @timed('NODE')
     def interpret_nex_script(self, rebuild=False):
         """Execute the Python script from a Blender Text datablock, capture local variables whose names start with "out_",
         and update the node group's output sockets accordingly."""
@@ -446,6 +453,7 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
         """when user delete the node we need to clean up"""
         
         self.user_textdata = None
+        unregister_instance(self)
 
         return None
 
@@ -490,12 +498,14 @@ class NODEBOOSTER_NG_nexinterpreter(bpy.types.GeometryNodeCustomGroup):
         return None
 
     @classmethod
-    def update_all_instances(cls, from_depsgraph=False,):
-        """search for all nodes of this type and update them"""
+    def update_all_instances(cls, from_depsgraph=False, updated_ids=None,):
+        """search for all nodes of this type and update them.
+        optionally pass a set of updated IDs keys, as user python code can read anything, any update is relevant"""
 
+        if (updated_ids is not None) and (not updated_ids):
+            return None
 
-        all_instances = [n for ng in bpy.data.node_groups for n in ng.nodes if (n.bl_idname==cls.bl_idname)]
-        for n in all_instances:
+        for n in get_all_instances(cls.bl_idname):
             if (from_depsgraph and not n.execute_at_depsgraph):
                 continue
             if (n.mute):
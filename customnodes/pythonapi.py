@@ -5,9 +5,26 @@
 
 import bpy 
 
+from mathutils import Vector
+
 from ..__init__ import get_addon_prefs
 from ..resources import cust_icon
 from ..nex.pytonode import convert_pyvar_to_data
+from ..utils.perf_utils import timed
+from ..utils.pyexp_utils import (
+    get_compiled_expression,
+    get_static_namespace,
+    ReadTracker,
+    unwrap,
+    set_read_set,
+    get_read_set,
+    is_read_set_updated,
+    get_expression_kind,
+)
+from ..utils.cache_utils import get_cached_values, set_cached_values, invalidate_frame_cache
+from ..utils.bake_utils import apply_baked_row
+from ..utils.users_utils import get_nodegroup_users
+from ..utils.registry_utils import get_all_instances, register_instance, unregister_instance, tag_registry_dirty, get_node_key
 from ..utils.node_utils import (
     create_new_nodegroup,
     set_socket_defvalue,
@@ -15,25 +32,33 @@ from ..utils.node_utils import (
     set_socket_label,
 )
 
+
+#the evaluations are counted outside of the nodes properties, writing a node property tags its tree for an update,
+# the node would then trigger itself on the next depsgraph signal.
+_EVALUATION_COUNTS = {} #{node_key:count,}
+
+
 class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
     """Custom Nodgroup: Evaluate a python expression as a single value output.
     • The evaluated values can be of type 'float', 'int', 'Vector', 'Color', 'Quaternion', 'Matrix', 'String', 'Object', 'Collection', 'Material' & 'list/tuple/set' up to len 16"""
 
-    #TODO Optimization: node_utils function should check if value or type isn't already set before setting it.
-    
     bl_idname = "GeometryNodeNodeBoosterPythonApi"
     bl_label = "Python Expression"
+    bake_width = 4 #number of values baked per frame, see bake_utils.py
     # bl_icon = 'SCRIPT'
 
+    def update_expression(self, context):
+        #the cached frames & the datablocks read were from the previous expression
+        invalidate_frame_cache(self)
+        set_read_set(self, None)
+        self.evaluate_python_expression(assign_socketype=True)
+        return None
+
     error_message : bpy.props.StringProperty(
         description="user interface error message",
         )
-    debug_evaluation_counter : bpy.props.IntProperty(
-        name="Execution Counter",
-        default=0,
-        )
     user_pyapiexp : bpy.props.StringProperty(
-        update=lambda self, context: self.evaluate_python_expression(assign_socketype=True),
+        update=update_expression,
         description="type the expression you wish to evaluate right here",
         )
     execute_at_depsgraph : bpy.props.BoolProperty(
@@ -41,6 +66,12 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
         description="Synchronize the python values with the outputs values on each depsgraph frame and interaction. By toggling this option, your script will be executed constantly.",
         default=True,
         )
+    use_read_tracking : bpy.props.BoolProperty(
+        name="Track Dependencies",
+        description="Record the datablocks read by the expression, it will only be refreshed when one of these is updated, or on frame changes if it reads the current frame, an animated datablock or evaluated data. The expression is expected to be deterministic. The datablocks read are wrapped, isinstance() works on them but type() does not",
+        default=False,
+        update=lambda self, context: set_read_set(self, None),
+        )
 
     @classmethod
     def poll(cls, context):
@@ -67,6 +98,8 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
         self.width = 250
         self.label = self.bl_label
 
+        register_instance(self)
+
         return None 
 
     def copy(self,node,):
@@ -74,23 +107,52 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
 
         self.node_tree = node.node_tree.copy()
 
+        #our copy might not have its final name yet, we let the registry rebuild itself
+        tag_registry_dirty()
+
         return None 
 
+    def free(self):
+        """when user delete the node we need to clean up"""
+
+        unregister_instance(self)
+        _EVALUATION_COUNTS.pop(get_node_key(self), None)
+
+        return None
+
     def update(self):
         """generic update function"""
 
         return None
 
+    def set_output_values(self, values,):
+        """assign the (value, label) evaluated from a previous execution, see the frame cache"""
+
+        ng = self.node_tree
+        set_value, set_label = values
+
+        #the error message is only written when leaving an error state, writing a node property tags its tree
+        set_socket_label(ng,1, label="NoErrors",)
+        if set_socket_defvalue(ng,1, value=False,):
+            self.error_message = ''
+
+        set_socket_label(ng,0, label=set_label ,)
+        set_socket_defvalue(ng,0, value=set_value ,)
+
+        return None
+
+    @timed('NODE')
     def evaluate_python_expression(self, assign_socketype=False,):
-        """evaluate the user string and assign value to output node"""
+        """evaluate the user string and assign value to output node, return the (value, label) assigned, or None on error"""
 
         ng = self.node_tree
-        self.debug_evaluation_counter += 1 # potential issue with int limit here? idk how blender handle this
+        key = get_node_key(self)
+        _EVALUATION_COUNTS[key] = _EVALUATION_COUNTS.get(key, 0) + 1
 
-        #we reset the Error status back to false
+        #we reset the Error status back to false, the message is only written when leaving an error state
         set_socket_label(ng,1, label="NoErrors",)
-        set_socket_defvalue(ng,1, value=False,)
-        self.error_message = ''
+        if set_socket_defvalue(ng,1, value=False,):
+            self.error_message = ''
 
         #check if string is empty first, perhaps user didn't input anything yet 
         if (self.user_pyapiexp==""):
@@ -99,35 +161,39 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
             set_socket_defvalue(ng,1, value=True,)
             return None
 
-        to_evaluate = self.user_pyapiexp
-
-        #support for macros
-        if ('#frame' in to_evaluate):
-            to_evaluate = to_evaluate.replace('#frame','scene.frame_current')
-
-        #define user namespace
+        #define user namespace, the modules namespace is built once, see pyexp_utils.py
         namespace = {}
-        namespace["bpy"] = bpy
         namespace["D"] = bpy.data
         namespace["C"] = bpy.context
         namespace["context"] = bpy.context
         namespace["scene"] = bpy.context.scene
-        namespace.update(vars(__import__('random')))
-        namespace.update(vars(__import__('mathutils')))
-        namespace.update(vars(__import__('math')))
 
         #'self' as object using this node? only if valid and not ambiguous
         node_obj_users = self.get_objects_from_node_instance()
         if (len(node_obj_users)==1):
             namespace["self"] = list(node_obj_users)[0]
 
+        #record the datablocks read by the expression? see pyexp_utils.py
+        tracker = None
+        if (self.use_read_tracking):
+            tracker = ReadTracker()
+            namespace["bpy"] = bpy
+            namespace = {k:tracker.wrap(v) for k,v in namespace.items()}
+
         #evaluated the user expression
         try:
+            #the expression, and its macros, are compiled a single time, see pyexp_utils.py
+            to_evaluate = get_compiled_expression(self.user_pyapiexp)
+
             #NOTE, maybe the execution needs to check for some sort of blender checks before allowing execution?
             # a little like the driver python expression, there's a global setting for that. Unsure if it's needed.
-            evaluated_pyvalue = eval(to_evaluate, {}, namespace,)
+            evaluated_pyvalue = eval(to_evaluate, get_static_namespace(), namespace,)
+
+            if (tracker is not None):
+                evaluated_pyvalue = unwrap(evaluated_pyvalue)
 
         except Exception as e:
+            set_read_set(self, None)
             print(f"{self.bl_idname} Evaluation Exception '{type(e).__name__}':\n{e}")
             msg = str(e)
             if ("name 'self' is not defined" in msg):
@@ -149,7 +215,12 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
             set_socket_label(ng,0, label=type(e).__name__,)
             set_socket_label(ng,1, label="ParsingError",)
             set_socket_defvalue(ng,1, value=True,)
+            set_read_set(self, None)
             return None
+
+        #the evaluation succeeded, these are the datablocks it depends on
+        if (tracker is not None):
+            set_read_set(self, tracker)
     
         #set values
         if (assign_socketype):
@@ -157,7 +228,11 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
         set_socket_label(ng,0, label=set_label ,)
         set_socket_defvalue(ng,0, value=set_value ,)
 
-        return None
+        return set_value, set_label
+
+    def get_evaluation_count(self) -> int:
+        """the number of times the expression was evaluated in this session"""
+        return _EVALUATION_COUNTS.get(get_node_key(self), 0)
 
     def draw_label(self,):
         """node label"""
@@ -169,7 +244,7 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
 
         sett_win = context.window_manager.nodebooster
         is_error = bool(self.error_message)
-        animated_icon = f"W_TIME_{self.debug_evaluation_counter%8}"
+        animated_icon = f"W_TIME_{self.get_evaluation_count()%8}"
 
         col = layout.column(align=True)
         row = col.row(align=True)
@@ -194,29 +269,145 @@ class NODEBOOSTER_NG_pythonapi(bpy.types.GeometryNodeCustomGroup):
         return None
 
     def get_objects_from_node_instance(self,):
-        """Return a list of objects using the given GeometryNodeTree."""
-        
-        #NOTE could support recur nodegroups perhaps? altho it will cause ambiguity..
-        users = set()
-        for o in bpy.data.objects:
-            for m in o.modifiers:
-                if (m.type=='NODES' and m.node_group):
-                    for n in m.node_group.nodes:
-                        if (n==self):
-                            users.add(o)
-        return users
+        """Return a set of objects using the GeometryNodeTree of this node, directly or nested in other nodegroups."""
+
+        #the objects using each nodegroup are indexed, see users_utils.py
+        return get_nodegroup_users(self.id_data)
+
+    def is_dependent(self, updated_ids) -> bool:
+        """check if any of the updated IDs keys might be used by this node, as user python code can read anything, any update is relevant,
+        unless the expression only use math functions & the current frame, or the datablocks read by the expression are tracked"""
+
+        match get_expression_kind(self.user_pyapiexp):
+            case 'CONSTANT'|'FRAME':
+                return False
+            case 'VOLATILE':
+                return bool(updated_ids)
+
+        read_set = get_read_set(self) if (self.use_read_tracking) else None
+        if (read_set is None):
+            return bool(updated_ids)
+
+        return is_read_set_updated(read_set, updated_ids)
+
+    def is_time_dependent(self) -> bool:
+        """check if the expression needs to be evaluated on frame changes"""
+
+        match get_expression_kind(self.user_pyapiexp):
+            case 'CONSTANT':
+                return False
+            case 'FRAME'|'VOLATILE':
+                return True
+
+        read_set = get_read_set(self) if (self.use_read_tracking) else None
+        if (read_set is None):
+            return True
+
+        return read_set[1]
+
+    def evaluate_cacheable_values(self,):
+        """evaluate the expression, return the values only if they are safe to keep in our frame cache"""
+
+        values = self.evaluate_python_expression(assign_socketype=False)
+
+        #random values are expected to change on each evaluation, even on the same frame
+        if (get_expression_kind(self.user_pyapiexp)=='VOLATILE'):
+            return None
+
+        #we never keep datablocks around, these could be freed
+        if (values is not None) and isinstance(values[0], bpy.types.ID):
+            return None
+
+        return values
+
+    def get_bake_signature(self) -> str:
+        """the baked values are only valid for the same expression"""
+
+        return f"{self.bl_idname}|{self.user_pyapiexp}"
+
+    def get_bake_row(self) -> tuple|None:
+        """the numeric values we can bake for the current frame, see bake_utils.py.
+        only float, int, bool & vectors values are supported, encoded as (kind, x, y, z)"""
+
+        values = self.evaluate_python_expression(assign_socketype=False)
+        if (values is None):
+            return None
+
+        match values[0]:
+            case bool(): return (2, float(values[0]), 0.0, 0.0)
+            case int(): return (1, float(values[0]), 0.0, 0.0)
+            case float(): return (0, values[0], 0.0, 0.0)
+            case Vector(): return (3, *values[0])
+
+        return None
+
+    def set_bake_row(self, row,):
+        """assign the baked values, decoded from (kind, x, y, z)"""
+
+        kind, x, y, z = row
+        match int(kind):
+            case 0: value = x
+            case 1: value = int(x)
+            case 2: value = bool(x)
+            case 3: value = Vector((x, y, z))
+
+        set_value, set_label, _ = convert_pyvar_to_data(value)
+        self.set_output_values((set_value, set_label))
+
+        return None
+
+    @classmethod
+    def invalidate_frame_caches(cls, updated_ids,):
+        """forget about the cached frames of the nodes depending on the given updated IDs keys"""
+
+        for n in get_all_instances(cls.bl_idname):
+            if n.is_dependent(updated_ids):
+                invalidate_frame_cache(n)
+
+        return None
 
     @classmethod
-    def update_all_instances(cls, from_depsgraph=False,):
-        """search for all nodes of this type and update them"""
+    def update_all_instances(cls, from_depsgraph=False, from_frame=False, updated_ids=None, frame_key=None, bake_frame=None, allow_exec=True,):
+        """search for all nodes of this type and update them.
+        if from_frame is True, the nodes whose expressions don't depend on time are skipped.
+        optionally pass a set of updated IDs keys, only the nodes depending on them will be updated.
+        optionally pass a frame key, the evaluated values will be cached for this frame.
+        optionally pass a bake frame, the values will be read from the bake file if possible.
+        if allow_exec is False, only the baked values are read, the user code is never executed"""
+
+        if (updated_ids is not None) and (not updated_ids):
+            return None
 
-        all_instances = [n for ng in bpy.data.node_groups for n in ng.nodes if (n.bl_idname==cls.bl_idname)]
-        for n in all_instances:
+        for n in get_all_instances(cls.bl_idname):
             if (from_depsgraph and not n.execute_at_depsgraph):
                 continue
             if (n.mute):
                 continue
-            n.evaluate_python_expression(assign_socketype=False)
+
+            #constant expressions are only evaluated when edited
+            if (updated_ids is not None) and (not n.is_dependent(updated_ids)):
+                continue
+            if (from_frame and not n.is_time_dependent()):
+                continue
+
+            if (bake_frame is not None) and apply_baked_row(n, bake_frame):
+                continue
+            if (not allow_exec):
+                continue
+
+            if (frame_key is None):
+                n.evaluate_python_expression(assign_socketype=False)
+                continue
+
+            #already evaluated for this frame? no need to execute the user code again
+            values = get_cached_values(n, frame_key)
+            if (values is not None):
+                n.set_output_values(values)
+                continue
+
+            values = n.evaluate_cacheable_values()
+            if (values is not None):
+                set_cached_values(n, frame_key, values)
             continue
 
         return None
\ No newline at end of file
@@ -5,9 +5,40 @@
 
 import bpy 
 
+import numpy
+
 from ..__init__ import get_addon_prefs
 from ..utils.str_utils import word_wrap
-from ..utils.node_utils import create_new_nodegroup, set_socket_defvalue
+from ..utils.node_utils import create_new_nodegroup, set_socket_defvalue, create_socket, remove_socket
+from ..utils.depsgraph_utils import get_id_key
+from ..utils.perf_utils import timed
+from ..utils.cache_utils import get_frame_values, invalidate_frame_cache
+from ..utils.bake_utils import apply_baked_row
+from ..utils.audio_utils import (
+    get_sound_envelope,
+    get_envelope_value,
+    get_sound_bands,
+    get_bands_row,
+    get_band_frequencies,
+    prefetch_sound_analysis,
+    is_analysis_pending,
+)
+from ..utils.sequencer_utils import (
+    get_active_sound_strips,
+    get_nearby_sound_strips,
+    get_strip_volume,
+    get_faded_envelope_value,
+    get_strips_key,
+)
+from ..utils.registry_utils import get_all_instances, register_instance, unregister_instance, tag_registry_dirty
+
+
+PREFETCH_SECONDS = 60 #strips starting within this time range around the playhead are analysed ahead of time
+
+
+def format_frequency(hz:float) -> str:
+    """short frequency label, ex: '120Hz' or '2.5kHz'"""
+    return f"{hz/1000:.3g}kHz" if (hz>=1000) else f"{hz:.0f}Hz"
 
 
 class NODEBOOSTER_NG_sequencervolume(bpy.types.GeometryNodeCustomGroup):
@@ -17,7 +48,71 @@ class NODEBOOSTER_NG_sequencervolume(bpy.types.GeometryNodeCustomGroup):
     bl_idname = "GeometryNodeNodeBoosterSequencerVolume"
     bl_label = "Sequencer Volume"
 
-    # frame_delay : bpy.props.IntProperty()
+    def update_settings(self, context):
+        invalidate_frame_cache(self)
+        self.update()
+        return None
+
+    def update_band_count(self, context):
+        self.ensure_output_sockets()
+        invalidate_frame_cache(self)
+        self.update()
+        return None
+
+    sample_mode : bpy.props.EnumProperty(
+        name="Level",
+        description="How the sound level is measured over the duration of a frame",
+        items=(
+            ('PEAK', "Peak", "The loudest sample of the frame"),
+            ('RMS', "RMS", "The root mean square of the frame samples, closer to the perceived loudness"),
+            ),
+        default='PEAK',
+        update=update_settings,
+        )
+    band_count : bpy.props.IntProperty(
+        name="Bands",
+        description="Output the amplitude of the given number of frequency bands, log spaced from 20Hz to 20kHz. Ex: 3 bands for bass, mid & treble",
+        default=0,
+        min=0,
+        soft_max=16,
+        max=64,
+        update=update_band_count,
+        )
+    frame_delay : bpy.props.IntProperty(
+        name="Delay",
+        description="Offset the sampled sound by the given number of frames. Positive values delay the outputs, negative values anticipate the sound",
+        default=0,
+        update=update_settings,
+        )
+    smooth_window : bpy.props.IntProperty(
+        name="Average",
+        description="Average the levels over a window of the given number of frames, centered on the sampled frame",
+        default=1,
+        min=1,
+        soft_max=48,
+        update=update_settings,
+        )
+    smooth_attack : bpy.props.FloatProperty(
+        name="Attack",
+        description="How fast the outputs rise toward a louder level, as a time constant in frames. 0 is immediate",
+        default=0.0,
+        min=0.0,
+        soft_max=48.0,
+        update=update_settings,
+        )
+    smooth_release : bpy.props.FloatProperty(
+        name="Release",
+        description="How fast the outputs fall toward a quieter level, as a time constant in frames. 0 is immediate",
+        default=0.0,
+        min=0.0,
+        soft_max=48.0,
+        update=update_settings,
+        )
+
+    @property
+    def bake_width(self):
+        """number of values baked per frame, see bake_utils.py"""
+        return 2 + self.band_count
 
     @classmethod
     def poll(cls, context):
@@ -34,6 +129,7 @@ class NODEBOOSTER_NG_sequencervolume(bpy.types.GeometryNodeCustomGroup):
             ng = create_new_nodegroup(name,
                 out_sockets={
                     "Volume" : "NodeSocketFloat",
+                    "With Fades" : "NodeSocketFloat",
                 },
             )
             
@@ -43,46 +139,109 @@ class NODEBOOSTER_NG_sequencervolume(bpy.types.GeometryNodeCustomGroup):
         self.width = 150
         self.label = self.bl_label
 
+        register_instance(self)
+
         return None 
 
     def copy(self,node,):
         """fct run when dupplicating the node"""
         
         self.node_tree = node.node_tree.copy()
+
+        #our copy might not have its final name yet, we let the registry rebuild itself
+        tag_registry_dirty()
         
         return None 
     
+    def free(self):
+        """when user delete the node we need to clean up"""
+
+        unregister_instance(self)
+
+        return None
+
     def update(self):
         """generic update function"""
-        
+
+        self.update_outputs()
+
+        return None
+
+    def ensure_output_sockets(self):
+        """create or remove the 'With Fades' and frequency bands outputs, placed after the 'Volume' output"""
+
         ng = self.node_tree
-        
-        # for later?
-        # frame = None 
-        # if (self.frame_delay):
-        #     frame = bpy.context.scene.frame_current + self.frame_delay
+        out_nod = ng.nodes["Group Output"]
 
-        set_socket_defvalue(ng,0,
-            value=self.evaluate_sequencer_volume(),
-            )
+        names = ["With Fades"]
+        if (self.band_count):
+            names += [f"{format_frequency(lo)}-{format_frequency(hi)}" for lo,hi in get_band_frequencies(self.band_count)]
+        current = [s.name for s in out_nod.inputs if (s.type!='CUSTOM')][1:]
+        if (current==names):
+            return None
+
+        for idx in reversed(range(1, len(current)+1)):
+            remove_socket(ng, idx, in_out='OUTPUT')
+        for name in names:
+            create_socket(ng, in_out='OUTPUT', socket_type="NodeSocketFloat", socket_name=name,)
+
+        return None
+
+    def update_outputs(self, frame_key=None,):
+        """update the outputs values, if a frame key is given, the values are read from the frame cache when possible"""
+
+        #None if the sounds are still being analysed, we keep the previous values until then
+        values = get_frame_values(self, frame_key, self.evaluate_sequencer_volume)
+        if (values is not None):
+            self.set_output_values(values)
 
         return None
 
+    def set_output_values(self, values,):
+        """assign the (volume, with_fades, *bands) values"""
+
+        ng = self.node_tree
+
+        #the interface might be out of sync, ex: a node group appended from an older file
+        if (len(ng.nodes["Group Output"].inputs)-1 != len(values)):
+            self.ensure_output_sockets()
+
+        for i,v in enumerate(values):
+            set_socket_defvalue(ng,i, value=v,)
+
+        return None
+
+    def get_bake_signature(self) -> str:
+        """the baked values are only valid for the same node settings"""
+
+        return f"{self.bl_idname}|fades|{self.sample_mode}|{self.band_count}|{self.frame_delay}|{self.smooth_window}|{self.smooth_attack:.4f}|{self.smooth_release:.4f}"
+
+    def get_bake_row(self) -> tuple|None:
+        """the numeric values we can bake for the current frame, see bake_utils.py"""
+
+        return self.evaluate_sequencer_volume()
+
+    def set_bake_row(self, row,):
+        """assign the baked values"""
+
+        self.set_output_values(row)
+
+        return None
+
+    @timed('NODE')
     def evaluate_sequencer_volume(self, frame=None,):
-        """evaluate the sequencer volume source
+        """evaluate the sequencer volume source, with and without the strips fades, and its frequency bands amplitudes,
+        return a (volume, with_fades, *bands) tuple, or None if the active strips sounds are still being analysed by our workers, see audio_utils.py.
+        if a frame is given, the strips volume are evaluated at this frame, otherwise their current volume is used.
         this node was possible thanks to tintwotin https://github.com/snuq/VSEQF/blob/3ac717e1fa8c7371ec40503428bc2d0d004f0b35/vseqf.py#L142"""
 
-        #TODO ideally we need to also sample volume from few frame before or after, so user can create a smoothing falloff of some sort, 
-        #     that's what 'frame_delay' is for, but unfortunately this function is incomplete, frame can only be None in order to work
-        #     right now i do not have the strength to do it, you'll need to check for 'fades.get_fade_curve(bpy.context, sequence, create=False)' from the github link above
-
         scene = bpy.context.scene
         if (scene.sequence_editor is None):
-            return 0
+            return (0.0,) * (2+self.band_count)
         
         totvolume = 0
-        sequences = scene.sequence_editor.sequences_all
-        depsgraph = bpy.context.evaluated_depsgraph_get()
+        totfaded = 0
+        totbands = numpy.zeros(self.band_count, dtype=numpy.float32)
         
         if (frame is None):
               frame = scene.frame_current
@@ -90,66 +249,145 @@ class NODEBOOSTER_NG_sequencervolume(bpy.types.GeometryNodeCustomGroup):
         else: evaluate_volume = True
 
         fps = scene.render.fps / scene.render.fps_base
+        bands_analysis = f'BANDS{self.band_count}'
+        smoothing = {'window':self.smooth_window, 'attack':self.smooth_attack, 'release':self.smooth_release,}
+        is_pending = False
+
+        #the sound heard 'frame_delay' frames ago
+        sampled = frame - self.frame_delay
+
+        #the strips playing are found from our strips index, see sequencer_utils.py
+        sequences = get_active_sound_strips(scene, sampled)
+
+        #strips not playing yet are analysed ahead of time, closest to the playhead first
+        for sequence in get_nearby_sound_strips(scene, sampled, PREFETCH_SECONDS*fps):
+            if (sequence.frame_final_start<sampled<sequence.frame_final_end):
+                continue
+            distance = (sequence.frame_final_start-sampled) if (sequence.frame_final_start>=sampled) else (sequence.frame_final_end-sampled)
+            prefetch_sound_analysis(sequence.sound, fps, self.sample_mode, distance)
+            if (self.band_count):
+                prefetch_sound_analysis(sequence.sound, fps, bands_analysis, distance)
 
         for sequence in sequences:
 
-            if ((sequence.type=='SOUND') and (sequence.frame_final_start<frame) 
-                and (sequence.frame_final_end>frame) and (not sequence.mute)):
-               
-                time_from = (frame - 1 - sequence.frame_start) / fps
-                time_to = (frame - sequence.frame_start) / fps
-
-                audio = sequence.sound.evaluated_get(depsgraph).factory
-                chunk = audio.limit(time_from, time_to).data()
-                
-                #sometimes the chunks cannot be read properly, try to read 2 frames instead
-                if (len(chunk)==0):
-                    time_from_temp = (frame - 2 - sequence.frame_start) / fps
-                    chunk = audio.limit(time_from_temp, time_to).data()
-                    
-                #chunk still couldnt be read...
-                if (len(chunk)==0):
-                    average = 0
-
-                else:
-                    cmax, cmin = abs(chunk.max()), abs(chunk.min())
-                    average = cmax if (cmax > cmin) else cmin
-
-                if evaluate_volume:
-                    # TODO: for later? get fade curve https://github.com/snuq/VSEQF/blob/8487c256db536eb2e9288a16248fe394d06dfb74/fades.py#L57
-                    # fcurve = get_fade_curve(bpy.context, sequence, create=False)
-                    # if (fcurve):
-                    #       volume = fcurve.evaluate(frame)
-                    # else: volume = sequence.volume
-                    volume = 0
-                else:
-                    volume = sequence.volume
-
-                totvolume += (average * volume)
+            #the sound is decoded a single time, we read the level of the frame that just played
+            envelope = get_sound_envelope(sequence.sound, fps, mode=self.sample_mode, **smoothing)
+            if (envelope is None):
+                is_pending = True
+                continue
+            index = round(sampled - 1 - sequence.frame_start)
+            average = get_envelope_value(envelope, index)
+
+            #the animated volume is multiplied into the envelope once per strip, see sequencer_utils.py
+            faded = get_faded_envelope_value(scene, sequence, envelope, sampled)
+            if (faded is None):
+                faded = average * sequence.volume
+
+            totvolume += faded if (evaluate_volume) else (average * sequence.volume)
+            totfaded += faded
+
+            if (self.band_count):
+                bands = get_sound_bands(sequence.sound, fps, self.band_count, **smoothing)
+                if (bands is None):
+                    is_pending = True
+                    continue
+                volume = get_strip_volume(scene, sequence, sampled) if (evaluate_volume) else sequence.volume
+                totbands += get_bands_row(bands, index) * volume
             
             continue 
 
-        return float(totvolume)
+        if (is_pending):
+            return None
+
+        return (float(totvolume), float(totfaded), *totbands.tolist())
+
+    def is_analysing(self) -> bool:
+        """check if any sound playing in the sequencer is still being analysed by our workers"""
+
+        scene = bpy.context.scene
+        if (scene.sequence_editor is None):
+            return False
+
+        fps = scene.render.fps / scene.render.fps_base
+        analyses = [self.sample_mode, f'BANDS{self.band_count}'] if (self.band_count) else [self.sample_mode]
+
+        for sequence in get_active_sound_strips(scene, scene.frame_current - self.frame_delay):
+            if any(is_analysis_pending(sequence.sound, fps, a) for a in analyses):
+                return True
+
+        return False
     
     def draw_label(self,):
         """node label"""
+
+        if self.is_analysing():
+            return f"{self.bl_label} (Analysing..)"
         
         return self.bl_label
 
     def draw_buttons(self,context,layout,):
         """node interface drawing"""
         
-        #for later?
-        #layout.prop(self,"frame_delay",text="Frame Delay")
+        row = layout.row(align=True)
+        row.prop(self,"sample_mode",text="",)
+        row.prop(self,"band_count",)
+
+        col = layout.column(align=True)
+        col.prop(self,"frame_delay",)
+        col.prop(self,"smooth_window",)
+        row = col.row(align=True)
+        row.prop(self,"smooth_attack",)
+        row.prop(self,"smooth_release",)
 
         return None 
     
+    def is_dependent(self, updated_ids) -> bool:
+        """check if any of the updated IDs keys are used by this node (the scene sequencer strips, their fades or their sounds).
+        the scene key itself is ignored, blender tags it on almost any edit, see sequencer_utils.tag_strips_updates()"""
+
+        scene = bpy.context.scene
+        if (get_strips_key(scene) in updated_ids):
+            return True
+
+        #the strips fades are animated by the scene action
+        if (scene.animation_data is not None) and (scene.animation_data.action is not None):
+            if (get_id_key(scene.animation_data.action) in updated_ids):
+                return True
+
+        if (scene.sequence_editor is None):
+            return False
+        if not any(k[0]=='SOUND' for k in updated_ids):
+            return False
+
+        for sequence in scene.sequence_editor.sequences_all:
+            if (sequence.type=='SOUND') and (sequence.sound is not None):
+                if (get_id_key(sequence.sound) in updated_ids):
+                    return True
+
+        return False
+
+    @classmethod
+    def invalidate_frame_caches(cls, updated_ids,):
+        """forget about the cached frames of the nodes depending on the given updated IDs keys"""
+
+        for n in get_all_instances(cls.bl_idname):
+            if n.is_dependent(updated_ids):
+                invalidate_frame_cache(n)
+
+        return None
+
     @classmethod
-    def update_all_instances(cls, from_depsgraph=False,):
-        """search for all nodes of this type and update them"""
+    def update_all_instances(cls, from_depsgraph=False, updated_ids=None, frame_key=None, bake_frame=None,):
+        """search for all nodes of this type and update them.
+        optionally pass a set of updated IDs keys, only the nodes depending on them will be updated.
+        optionally pass a frame key, the output value will be cached for this frame.
+        optionally pass a bake frame, the output value will be read from the bake file if possible"""
 
-        all_instances = [n for ng in bpy.data.node_groups for n in ng.nodes if (n.bl_idname==cls.bl_idname)]
-        for n in all_instances:
-            n.update()
+        for n in get_all_instances(cls.bl_idname):
+            if (updated_ids is not None) and (not n.is_dependent(updated_ids)):
+                continue
+            if (bake_frame is not None) and apply_baked_row(n, bake_frame):
+                continue
+            n.update_outputs(frame_key=frame_key)
 
         return None
\ No newline at end of file
@@ -9,6 +9,15 @@ from collections.abc import Iterable
 
 from .__init__ import get_addon_prefs
 from .operators.palette import msgbus_palette_callback
+from .utils.registry_utils import tag_registry_dirty
+from .utils.users_utils import tag_users_index_dirty, tag_users_index_from_depsgraph, get_own_writes_consequences
+from .utils.pyexp_utils import clear_read_sets
+from .utils.depsgraph_utils import get_updated_ids, pop_own_writes
+from .utils.cache_utils import get_frame_key, clear_frame_cache
+from .utils.bake_utils import is_bake_readable, is_baking, clear_bake
+from .utils.audio_utils import invalidate_envelopes, clear_envelopes, set_results_callback, deliver_analysis_results
+from .utils.sequencer_utils import invalidate_strips_index, clear_strips_index, tag_strips_updates
+from .utils.perf_utils import timed, set_stats_enabled, start_trace_from_environ, stop_trace
 from .customnodes import (
     NODEBOOSTER_NG_camerainfo,
     NODEBOOSTER_NG_pythonapi,
@@ -65,32 +74,171 @@ def unregister_msgbusses():
     return None
 
 
+# We coalesce the depsgraph signals
+
+
+PENDING_UPDATED_IDS = set() #datablocks keys gathered from depsgraph signals since our last flush
+
+
+def update_all_instances_from_depsgraph(updated_ids):
+    """update the booster nodes depending on the given updated IDs keys"""
+
+    sett_win = bpy.context.window_manager.nodebooster
+
+    #need to update camera nodes outputs, if their camera or scene changed
+    NODEBOOSTER_NG_camerainfo.update_all_instances(from_depsgraph=True, updated_ids=updated_ids)
+
+    #need to update volume sequencer nodes, if the strips or their sounds changed
+    NODEBOOSTER_NG_sequencervolume.update_all_instances(from_depsgraph=True, updated_ids=updated_ids)
+
+    #automatic re-evaluation of the Python Expression and Python Nex Nodes.
+    #for security reasons, only if the user allows it expressively on each program session.
+    if (sett_win.allow_auto_exec):
+        NODEBOOSTER_NG_pythonapi.update_all_instances(from_depsgraph=True, updated_ids=updated_ids)
+        NODEBOOSTER_NG_nexinterpreter.update_all_instances(from_depsgraph=True, updated_ids=updated_ids)
+
+    return None
+
+
+def invalidate_frame_caches(updated_ids):
+    """forget about the cached frames of the booster nodes depending on the given updated IDs keys"""
+
+    NODEBOOSTER_NG_camerainfo.invalidate_frame_caches(updated_ids)
+    NODEBOOSTER_NG_sequencervolume.invalidate_frame_caches(updated_ids)
+    NODEBOOSTER_NG_pythonapi.invalidate_frame_caches(updated_ids)
+
+    return None
+
+
+def is_synchronous_update_required() -> bool:
+    """some situations can't wait for our timer, the outputs values need to be correct right away"""
+
+    #no event loop in background mode, our timer might never run
+    if (bpy.app.background):
+        return True
+
+    #values needs to be correct for the frame being rendered
+    if (bpy.app.is_job_running('RENDER')):
+        return True
+
+    return False
+
+
+@timed('HANDLER')
+def flush_pending_updates():
+    """timer callback, update the nodes depending on all the IDs gathered since our last flush"""
+
+    if (not PENDING_UPDATED_IDS):
+        return None
+
+    updated_ids = PENDING_UPDATED_IDS.copy()
+    PENDING_UPDATED_IDS.clear()
+
+    if (get_addon_prefs().debug_depsgraph):
+        print(f"flush_pending_updates(): flushing {len(updated_ids)} gathered update(s)")
+
+    update_all_instances_from_depsgraph(updated_ids)
+
+    #returning None will unregister the timer, the next depsgraph signal will register it again
+    return None
+
+
+def schedule_pending_updates(updated_ids, interval=0.0,):
+    """gather the updated IDs, they will be processed at once by our timer after the given interval"""
+
+    PENDING_UPDATED_IDS.update(updated_ids)
+
+    if (not bpy.app.timers.is_registered(flush_pending_updates)):
+        bpy.app.timers.register(flush_pending_updates, first_interval=interval,)
+
+    return None
+
+
+def flush_pending_updates_now():
+    """process the gathered updates right away, and stop our timer"""
+
+    if (bpy.app.timers.is_registered(flush_pending_updates)):
+        bpy.app.timers.unregister(flush_pending_updates)
+
+    flush_pending_updates()
+
+    return None
+
+
+def cancel_pending_updates():
+    """forget about the gathered updates and stop our timer"""
+
+    PENDING_UPDATED_IDS.clear()
+
+    if (bpy.app.timers.is_registered(flush_pending_updates)):
+        bpy.app.timers.unregister(flush_pending_updates)
+
+    return None
+
+
+# Sounds analysed by our workers are delivered here
+
+
+def audio_analysis_callback():
+    """new sounds analysis are available, see audio_utils.py"""
+
+    if (get_addon_prefs().debug_depsgraph):
+        print("audio_analysis_callback(): new sounds analysis delivered")
+
+    NODEBOOSTER_NG_sequencervolume.update_all_instances(from_depsgraph=True)
+
+    #the nodes labels show their analysing state
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if (area.type=='NODE_EDITOR'):
+                area.tag_redraw()
+
+    return None
+
+
 # Then we register the handlers
 
 
 @bpy.app.handlers.persistent
+@timed('HANDLER')
 def nodebooster_handler_depspost(scene,desp):
     """update on depsgraph change"""
 
     sett_plugin = get_addon_prefs()
-    sett_win = bpy.context.window_manager.nodebooster
+
+    #which datablocks changed? we ignore the updates caused by our own nodes writing their outputs
+    updated_ids = get_updated_ids(desp, ignored=get_own_writes_consequences())
+
+    #the sequencer strips are not IDs, did they change along with their scene?
+    tag_strips_updates(updated_ids)
 
     if (sett_plugin.debug_depsgraph):
-        print("nodebooster_handler_depspost(): depsgraph signal")
+        print(f"nodebooster_handler_depspost(): depsgraph signal, {len(updated_ids)} relevant update(s)")
 
-    #need to update camera nodes outputs
-    NODEBOOSTER_NG_camerainfo.update_all_instances(from_depsgraph=True)
+    if (not updated_ids):
+        return None
 
-    #automatic re-evaluation of the Python Expression and Python Nex Nodes.
-    #for security reasons, only if the user allows it expressively on each program session.
-    if (sett_win.allow_auto_exec):
-        NODEBOOSTER_NG_pythonapi.update_all_instances(from_depsgraph=True)
-        NODEBOOSTER_NG_nexinterpreter.update_all_instances(from_depsgraph=True)
+    #the objects using our nodes might have changed, if a modifier or nodegroup was updated
+    tag_users_index_from_depsgraph(desp, updated_ids)
+
+    #the cached frames, sounds envelopes & strips indexes are invalidated right away, a frame change could occur before our timer runs
+    invalidate_frame_caches(updated_ids)
+    invalidate_envelopes(updated_ids)
+    invalidate_strips_index(updated_ids)
+
+    #update right away?
+    if ((sett_plugin.update_rate<=0) or is_synchronous_update_required()):
+        update_all_instances_from_depsgraph(updated_ids)
+        return None
+
+    #or interactive transforms can send dozens of signals per seconds, we update at a fixed rate instead
+    schedule_pending_updates(updated_ids, interval=1/sett_plugin.update_rate,)
 
     return None
 
 
 @bpy.app.handlers.persistent
+@timed('HANDLER')
 def nodebooster_handler_framepre(scene,desp):
     """update on frame change"""
 
@@ -100,18 +248,35 @@ def nodebooster_handler_framepre(scene,desp):
     if (sett_plugin.debug_depsgraph):
         print("nodebooster_handler_framepre(): frame_pre signal")
 
+    #the bake operator evaluates the nodes itself on each frame, see bakeoutputs.py
+    if (is_baking()):
+        return None
+
+    #the gathered depsgraph updates can't wait for our timer, the nodes that don't depend on time are skipped below
+    flush_pending_updates_now()
+
+    #the time-varying nodes outputs values can be cached per frame
+    frame_key = get_frame_key(scene) if (sett_plugin.use_frame_cache) else None
+
+    #render farm workers can read the values baked next to the .blend, see bake_utils.py. only whole frames are baked.
+    bake_frame = scene.frame_current if (is_bake_readable() and scene.frame_subframe==0) else None
+
     #need to update camera nodes outputs
-    NODEBOOSTER_NG_camerainfo.update_all_instances(from_depsgraph=True)
+    NODEBOOSTER_NG_camerainfo.update_all_instances(from_depsgraph=True, frame_key=frame_key, bake_frame=bake_frame)
 
     #need to update all volume sequencer nodes output value
-    NODEBOOSTER_NG_sequencervolume.update_all_instances(from_depsgraph=True)
+    NODEBOOSTER_NG_sequencervolume.update_all_instances(from_depsgraph=True, frame_key=frame_key, bake_frame=bake_frame)
 
     #automatic re-evaluation of the Python Expression and Python Nex Nodes.
     #for security reasons, only if the user allows it expressively on each program session.
     if (sett_win.allow_auto_exec):
-        NODEBOOSTER_NG_pythonapi.update_all_instances(from_depsgraph=True)
+        NODEBOOSTER_NG_pythonapi.update_all_instances(from_depsgraph=True, from_frame=True, frame_key=frame_key, bake_frame=bake_frame)
         NODEBOOSTER_NG_nexinterpreter.update_all_instances(from_depsgraph=True)
 
+    #reading baked values is not executing code, no need for the user consent
+    elif (bake_frame is not None):
+        NODEBOOSTER_NG_pythonapi.update_all_instances(from_depsgraph=True, bake_frame=bake_frame, allow_exec=False)
+
     return None
 
 
@@ -127,6 +292,54 @@ def nodebooster_handler_loadpost(scene,desp):
     #need to add message bus on each blender load
     register_msgbusses()
 
+    #updates gathered from the previous file are meaningless, and so are our writes
+    cancel_pending_updates()
+    pop_own_writes()
+
+    #our booster nodes instances registry, and the objects using them, are no longer valid
+    tag_registry_dirty()
+    tag_users_index_dirty()
+
+    #cached values are from the previous file
+    clear_read_sets()
+    clear_frame_cache()
+    clear_envelopes()
+    clear_strips_index()
+    clear_bake()
+
+    return None
+
+
+@bpy.app.handlers.persistent
+def nodebooster_handler_undopost(scene,desp):
+    """Handler function when user is undoing or redoing"""
+
+    sett_plugin = get_addon_prefs()
+
+    if (sett_plugin.debug_depsgraph):
+        print("nodebooster_handler_undopost(): undo_post signal")
+
+    #nodes or modifiers might have been restored or removed without going through their init/free callbacks
+    tag_registry_dirty()
+    tag_users_index_dirty()
+
+    #any datablock might have been restored to a previous state, without depsgraph signal
+    pop_own_writes()
+    clear_read_sets()
+    clear_frame_cache()
+    clear_envelopes()
+    clear_strips_index()
+
+    return None
+
+
+@bpy.app.handlers.persistent
+def nodebooster_handler_savepost(scene,desp):
+    """Handler function when user is saving the file"""
+
+    #the bake staleness is only checked when it's loaded, the saved scene is what render farm workers will see
+    clear_bake()
+
     return None
 
 
@@ -143,6 +356,15 @@ def all_handlers(name=False):
 
 
 def load_handlers():
+
+    #timings recording is a python side state, we need to restore it
+    set_stats_enabled(get_addon_prefs().debug_timings)
+
+    #profiling a background job? see perf_utils.py
+    start_trace_from_environ()
+
+    #our audio workers results are handed back to us
+    set_results_callback(audio_analysis_callback)
     
     handler_names = [h.__name__ for h in all_handlers()]
 
@@ -154,12 +376,29 @@ def load_handlers():
 
     if ('nodebooster_handler_loadpost' not in handler_names):
         bpy.app.handlers.load_post.append(nodebooster_handler_loadpost)
+
+    if ('nodebooster_handler_undopost' not in handler_names):
+        bpy.app.handlers.undo_post.append(nodebooster_handler_undopost)
+        bpy.app.handlers.redo_post.append(nodebooster_handler_undopost)
+
+    if ('nodebooster_handler_savepost' not in handler_names):
+        bpy.app.handlers.save_post.append(nodebooster_handler_savepost)
         
     return None 
 
 
 def unload_handlers():
 
+    #our nodes are no longer updated once the add-on is disabled
+    cancel_pending_updates()
+
+    set_results_callback(None)
+    if (bpy.app.timers.is_registered(deliver_analysis_results)):
+        bpy.app.timers.unregister(deliver_analysis_results)
+
+    #write the trace being recorded, if any
+    stop_trace()
+
     for h in all_handlers():
 
         if(h.__name__=='nodebooster_handler_depspost'):
@@ -171,4 +410,13 @@ def unload_handlers():
         if(h.__name__=='nodebooster_handler_loadpost'):
             bpy.app.handlers.load_post.remove(h)
 
+        if(h.__name__=='nodebooster_handler_undopost'):
+            if (h in bpy.app.handlers.undo_post):
+                bpy.app.handlers.undo_post.remove(h)
+            if (h in bpy.app.handlers.redo_post):
+                bpy.app.handlers.redo_post.remove(h)
+
+        if(h.__name__=='nodebooster_handler_savepost'):
+            bpy.app.handlers.save_post.remove(h)
+
     return None
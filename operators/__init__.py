@@ -14,6 +14,9 @@ from .drawframes import NODEBOOSTER_OT_draw_frame
 from .chamfer import NODEBOOSTER_OT_chamfer
 from .palette import NODEBOOSTER_OT_setcolor, NODEBOOSTER_OT_palette_reset_color, NODEBOOSTER_OT_initalize_palette
 from .codetemplates import NODEBOOSTER_OT_text_templates
+from .perfstats import NODEBOOSTER_OT_clear_stats, NODEBOOSTER_OT_trace_record
+from .framecache import NODEBOOSTER_OT_prime_frame_cache, NODEBOOSTER_OT_clear_frame_cache, NODEBOOSTER_OT_clear_audio_cache
+from .bakeoutputs import NODEBOOSTER_OT_bake_outputs, NODEBOOSTER_OT_delete_bake
 
 classes = (
 
@@ -29,6 +32,13 @@ classes = (
     NODEBOOSTER_OT_palette_reset_color,
     NODEBOOSTER_OT_initalize_palette,
     NODEBOOSTER_OT_text_templates,
+    NODEBOOSTER_OT_clear_stats,
+    NODEBOOSTER_OT_trace_record,
+    NODEBOOSTER_OT_prime_frame_cache,
+    NODEBOOSTER_OT_clear_frame_cache,
+    NODEBOOSTER_OT_clear_audio_cache,
+    NODEBOOSTER_OT_bake_outputs,
+    NODEBOOSTER_OT_delete_bake,
 
     )
 
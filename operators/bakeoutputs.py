@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import bpy
+
+import os
+import numpy
+
+from ..utils.registry_utils import get_all_instances
+from ..utils.bake_utils import get_bake_filepath, get_scene_fingerprint, write_bake, set_baking, clear_bake
+from ..customnodes import (
+    NODEBOOSTER_NG_camerainfo,
+    NODEBOOSTER_NG_pythonapi,
+    NODEBOOSTER_NG_sequencervolume,
+)
+
+
+def get_bakeable_nodes(context) -> list:
+    """gather the booster nodes instances which outputs values can be baked"""
+
+    sett_win = context.window_manager.nodebooster
+
+    nodes = []
+    nodes += get_all_instances(NODEBOOSTER_NG_camerainfo.bl_idname)
+    nodes += get_all_instances(NODEBOOSTER_NG_sequencervolume.bl_idname)
+
+    #for security reasons, the user code is only executed with the user consent
+    if (sett_win.allow_auto_exec):
+        nodes += [n for n in get_all_instances(NODEBOOSTER_NG_pythonapi.bl_idname) 
+                  if (n.execute_at_depsgraph and not n.mute)]
+
+    return nodes
+
+
+class NODEBOOSTER_OT_bake_outputs(bpy.types.Operator):
+
+    bl_idname = "nodebooster.bake_outputs"
+    bl_label = "Bake Outputs to Disk"
+    bl_description = "Evaluate the time-varying booster nodes over the scene frame range, and write their outputs values to a file next to the .blend. Render farm workers running in background mode will read these values instead of evaluating the nodes. The bake is ignored if your scene changed since"
+
+    @classmethod
+    def poll(cls, context):
+        return bool(bpy.data.filepath)
+
+    def execute(self, context):
+
+        scene = context.scene
+        wm = context.window_manager
+        frame_current = scene.frame_current
+        frames = range(scene.frame_start, scene.frame_end+1)
+
+        nodes = get_bakeable_nodes(context)
+        if (not nodes):
+            self.report({'WARNING'}, "No booster nodes to bake")
+            return {'CANCELLED'}
+
+        #NaN values are frames that could not be baked, they'll be evaluated live
+        tables = [numpy.full((len(frames), n.bake_width), numpy.nan) for n in nodes]
+
+        #our frame_pre handler is suspended while baking, the nodes are only evaluated once per frame, below
+        set_baking(True)
+        wm.progress_begin(0, len(frames))
+        try:
+            for i,frame in enumerate(frames):
+                scene.frame_set(frame)
+                for n,table in zip(nodes, tables):
+                    row = n.get_bake_row()
+                    if (row is not None):
+                        table[i] = row
+                wm.progress_update(i)
+        finally:
+            wm.progress_end()
+            set_baking(False)
+            scene.frame_set(frame_current)
+
+        filepath = get_bake_filepath()
+        entries = [{'node':n, 'signature':n.get_bake_signature(), 'values':table} for n,table in zip(nodes, tables)]
+        write_bake(filepath, frames.start, frames.stop-1, get_scene_fingerprint(scene), entries,)
+
+        self.report({'INFO'}, f"Baked {len(nodes)} node(s) over {len(frames)} frame(s) to '{os.path.basename(filepath)}'")
+
+        return {'FINISHED'}
+
+
+class NODEBOOSTER_OT_delete_bake(bpy.types.Operator):
+
+    bl_idname = "nodebooster.delete_bake"
+    bl_label = "Delete Bake"
+    bl_description = "Remove the baked outputs values file next to the .blend"
+
+    @classmethod
+    def poll(cls, context):
+        filepath = get_bake_filepath()
+        return bool(filepath) and os.path.exists(filepath)
+
+    def execute(self, context):
+
+        os.remove(get_bake_filepath())
+        clear_bake()
+
+        return {'FINISHED'}
@@ -0,0 +1,75 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import bpy
+
+from ..__init__ import get_addon_prefs
+from ..utils.cache_utils import clear_frame_cache, get_cached_frames_count
+from ..utils.audio_utils import clear_cache_directory, clear_envelopes
+
+
+class NODEBOOSTER_OT_prime_frame_cache(bpy.types.Operator):
+
+    bl_idname = "nodebooster.prime_frame_cache"
+    bl_label = "Prime Frame Cache"
+    bl_description = "Step through the given frame range, so the time-varying booster nodes outputs values are cached for each frame before playing or rendering"
+    bl_options = {'REGISTER'}
+
+    frame_start : bpy.props.IntProperty(name="Start", default=1,)
+    frame_end : bpy.props.IntProperty(name="End", default=250,)
+
+    @classmethod
+    def poll(cls, context):
+        return get_addon_prefs().use_frame_cache
+
+    def invoke(self, context, event):
+
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+
+        scene = context.scene
+        frame_current = scene.frame_current
+        count = get_cached_frames_count()
+
+        #our frame_change_pre handler fill the cache on each frame
+        for frame in range(self.frame_start, self.frame_end+1):
+            scene.frame_set(frame)
+
+        scene.frame_set(frame_current)
+
+        self.report({'INFO'}, f"Cached {get_cached_frames_count()-count} new frame value(s)")
+
+        return {'FINISHED'}
+
+
+class NODEBOOSTER_OT_clear_frame_cache(bpy.types.Operator):
+
+    bl_idname = "nodebooster.clear_frame_cache"
+    bl_label = "Clear Frame Cache"
+    bl_description = "Forget about all the cached outputs values"
+
+    def execute(self, context):
+
+        clear_frame_cache()
+
+        return {'FINISHED'}
+
+
+class NODEBOOSTER_OT_clear_audio_cache(bpy.types.Operator):
+
+    bl_idname = "nodebooster.clear_audio_cache"
+    bl_label = "Clear Audio Cache"
+    bl_description = "Remove all the sounds analysis stored in the audio cache directory"
+
+    def execute(self, context):
+
+        clear_envelopes()
+        clear_cache_directory()
+
+        return {'FINISHED'}
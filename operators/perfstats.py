@@ -0,0 +1,53 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import bpy
+
+from ..utils.perf_utils import clear_stats, is_tracing, start_trace, stop_trace
+from ..utils.pyexp_utils import clear_compile_cache_stats
+
+
+class NODEBOOSTER_OT_clear_stats(bpy.types.Operator):
+
+    bl_idname = "nodebooster.clear_stats"
+    bl_label = "Clear Timings"
+    bl_description = "Forget about all the recorded timings and cache counters"
+
+    def execute(self, context):
+
+        clear_stats()
+        clear_compile_cache_stats()
+
+        return {'FINISHED'}
+
+
+class NODEBOOSTER_OT_trace_record(bpy.types.Operator):
+
+    bl_idname = "nodebooster.trace_record"
+    bl_label = "Record Trace"
+    bl_description = "Start or stop recording a timeline of the add-on executions, written as a chrome trace-event json file (open it with chrome://tracing or ui.perfetto.dev)"
+
+    filepath : bpy.props.StringProperty(subtype="FILE_PATH", default="//nodebooster_trace.json",)
+    filter_glob : bpy.props.StringProperty(default="*.json", options={'HIDDEN'},)
+
+    def invoke(self, context, event):
+
+        if (is_tracing()):
+            return self.execute(context)
+
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+
+        if (is_tracing()):
+            filepath = stop_trace()
+            self.report({'INFO'}, f"Trace written to '{filepath}'")
+            return {'FINISHED'}
+
+        start_trace(self.filepath)
+        self.report({'INFO'}, "Recording trace..")
+
+        return {'FINISHED'}
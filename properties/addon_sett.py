@@ -5,6 +5,9 @@
 
 import bpy 
 
+from ..utils.perf_utils import set_stats_enabled
+from ..utils.cache_utils import clear_frame_cache
+
 
 class NODEBOOSTER_AddonPref(bpy.types.AddonPreferences):
 
@@ -19,6 +22,37 @@ class NODEBOOSTER_AddonPref(bpy.types.AddonPreferences):
         name="Depsgraph Debug",
         default=False,
         )
+    debug_timings : bpy.props.BoolProperty(
+        name="Record Timings",
+        description="Record the time spent in our handlers and in each booster node evaluation. See the statistics in the 'Node Booster > Performance' panel",
+        default=False,
+        update=lambda self, context: set_stats_enabled(self.debug_timings),
+        )
+    update_rate : bpy.props.FloatProperty(
+        name="Interactive Update Rate",
+        description="Maximal rate, in updates per second, at which the booster nodes are refreshed while interacting with blender. Depsgraph signals received in between are gathered and processed at once. Set to 0 to refresh on every depsgraph signal. Frame changes and renders are always refreshed immediately",
+        default=30,
+        min=0,
+        soft_max=120,
+        )
+    use_frame_cache : bpy.props.BoolProperty(
+        name="Frame Cache",
+        description="Remember the outputs values of the Camera Info, Sequencer Volume and automatically refreshed Python Expression nodes for each frame, so playing or rendering the same frames again won't evaluate them again. The cache of a node is forgotten when the data it depends on changes. Python expressions using random functions are never cached. Disable it if your python expressions are not deterministic in other ways (ex: reading the system time)",
+        default=True,
+        update=lambda self, context: clear_frame_cache(),
+        )
+    audio_cache_directory : bpy.props.StringProperty(
+        name="Audio Cache Directory",
+        description="Where the Sequencer Volume node store its sounds analysis, so they are not decoded again in other sessions. Leave empty to use the add-on user directory. Render farm workers can share a network directory",
+        subtype='DIR_PATH',
+        default="",
+        )
+    audio_cache_size : bpy.props.IntProperty(
+        name="Audio Cache Size (MB)",
+        description="Maximal size of the audio cache directory, the least recently used analysis are removed first",
+        default=1024,
+        min=0,
+        )
     #not exposed
     ui_word_wrap_max_char_factor : bpy.props.FloatProperty(
         default=1.0,
@@ -39,5 +73,12 @@ class NODEBOOSTER_AddonPref(bpy.types.AddonPreferences):
         
         layout.prop(self,"debug",)
         layout.prop(self,"debug_depsgraph",)
+        layout.prop(self,"debug_timings",)
+        layout.prop(self,"update_rate",)
+        layout.prop(self,"use_frame_cache",)
+        layout.prop(self,"audio_cache_directory",)
+        row = layout.row(align=True)
+        row.prop(self,"audio_cache_size",)
+        row.operator("nodebooster.clear_audio_cache", text="", icon="TRASH",)
         
         return None
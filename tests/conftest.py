@@ -0,0 +1,28 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE these tests need the 'bpy' module, they are skipped without it. run them with the python of blender,
+#  or with the 'bpy' package from pypi, matching the blender version: 'pip install bpy pytest' then 'python -m pytest tests'
+
+
+import os, sys, importlib
+
+import pytest
+
+
+ADDON_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def addon_module():
+    """return a function importing the given submodule of our addon package, ex: 'utils.node_utils'"""
+
+    pytest.importorskip("bpy")
+
+    #our addon is a package, its name depends on the folder it's installed in
+    parent, name = os.path.split(ADDON_DIRECTORY)
+    if (parent not in sys.path):
+        sys.path.insert(0, parent)
+
+    return lambda path: importlib.import_module(f"{name}.{path}")
@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+
+@pytest.fixture
+def booster_setup(addon_module):
+    """a booster nodegroup, nested in a nodegroup used by an object modifier"""
+
+    node_utils = addon_module("utils.node_utils")
+
+    ng = node_utils.create_new_nodegroup(".GeometryNodeNodeBoosterTest", out_sockets={"Value":"NodeSocketFloat"},)
+    parent = node_utils.create_new_nodegroup("BoosterTestParent", out_sockets={"Geometry":"NodeSocketGeometry"},)
+    group = parent.nodes.new('GeometryNodeGroup')
+    group.node_tree = ng
+
+    obj = bpy.data.objects.new("BoosterTestObject", bpy.data.meshes.new("BoosterTestMesh"))
+    bpy.context.scene.collection.objects.link(obj)
+    mod = obj.modifiers.new("BoosterTest", 'NODES')
+    mod.node_group = parent
+
+    addon_module("utils.users_utils").tag_users_index_dirty()
+    bpy.context.view_layer.update()
+
+    yield ng, parent, obj
+
+    bpy.data.objects.remove(obj)
+    bpy.data.node_groups.remove(parent)
+    bpy.data.node_groups.remove(ng)
+
+
+def capture_updates(addon_module, action) -> list:
+    """run the given action, and return the (all, relevant) updated IDs keys of the depsgraph signals it sends"""
+
+    depsgraph_utils = addon_module("utils.depsgraph_utils")
+    users_utils = addon_module("utils.users_utils")
+
+    captured = []
+    def handler(scene, depsgraph):
+        ignored = users_utils.get_own_writes_consequences()
+        captured.append((depsgraph_utils.get_updated_ids(depsgraph), depsgraph_utils.get_updated_ids(depsgraph, ignored=ignored)))
+
+    depsgraph_utils.pop_own_writes()
+    bpy.app.handlers.depsgraph_update_post.append(handler)
+    try:
+        action()
+        bpy.context.view_layer.update()
+    finally:
+        bpy.app.handlers.depsgraph_update_post.remove(handler)
+
+    return captured
+
+
+def test_own_write_does_not_schedule_update(addon_module, booster_setup):
+    ng, parent, obj = booster_setup
+    node_utils = addon_module("utils.node_utils")
+
+    captured = capture_updates(addon_module, lambda: node_utils.set_socket_defvalue(ng, 0, value=1.5),)
+
+    #blender did tag the trees & objects using our nodegroup
+    assert any(('NODETREE', parent.name_full) in everything for everything,_ in captured)
+    #but none of these updates are relevant to our handlers
+    assert not any(relevant for _,relevant in captured)
+
+
+def test_unchanged_write_is_not_recorded(addon_module, booster_setup):
+    ng, parent, obj = booster_setup
+    node_utils = addon_module("utils.node_utils")
+    depsgraph_utils = addon_module("utils.depsgraph_utils")
+
+    node_utils.set_socket_defvalue(ng, 0, value=2.0)
+    depsgraph_utils.pop_own_writes()
+
+    assert not node_utils.set_socket_defvalue(ng, 0, value=2.0)
+    assert not depsgraph_utils.pop_own_writes()
+
+
+def test_user_edit_is_still_relevant(addon_module, booster_setup):
+    ng, parent, obj = booster_setup
+    node_utils = addon_module("utils.node_utils")
+
+    def action():
+        node_utils.set_socket_defvalue(ng, 0, value=3.0)
+        obj.location.x += 1.0
+
+    captured = capture_updates(addon_module, action)
+
+    assert any(('OBJECT', obj.name_full) in relevant for _,relevant in captured)
@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import ast, math
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("bpy")
+
+
+@pytest.fixture
+def mathexpression(addon_module):
+    return addon_module("customnodes.mathexpression")
+
+
+def sanatize(mathexpression, expression, algebric=False,) -> str:
+    """sanatize the given expression the way a Math Expression node would"""
+
+    node = SimpleNamespace(use_algrebric_multiplication=algebric)
+
+    return mathexpression.NODEBOOSTER_NG_mathexpression.sanatize_math_expression(node, expression)
+
+
+@pytest.mark.parametrize("expression, algebric, expected", [
+    ("(a+b)²c", False, "(a+b)**2*c"),
+    ("(a+b)²c", True, "(a+b)**2*c"),
+    ("(a+b)²2", False, "(a+b)**2*2"),
+    ("a²b", False, "(a**2)*b"),
+    ("a²sin(x)", True, "(a**2)*sin(x)"),
+    ("2(a+b)", False, "2*(a+b)"),
+    ("2ab²", True, "2*a*(b**2)"),
+    ("(a)(b)", True, "(a)*(b)"),
+    ("12²", False, "(12**2)"),
+    ])
+def test_sanatize_implicit_multiplications(mathexpression, expression, algebric, expected):
+    assert sanatize(mathexpression, expression, algebric) == expected
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("a$b", "Unauthorized Symbol '$'"),
+    ("²a", "Unauthorized Symbol '²'"),
+    ("1.2.3+a", "Unrecognized Float"),
+    ])
+def test_sanatize_errors(mathexpression, expression, message):
+    with pytest.raises(Exception, match=message.replace('$','\\$')):
+        sanatize(mathexpression, expression)
+
+
+def transform(mathexpression, expression):
+    return mathexpression.FunctionTransformer().transform_math_tree(expression)
+
+
+def evaluate(mathexpression, tree, **variables) -> float:
+    """evaluate the given function expression tree with python functions instead of nodes"""
+
+    code = compile(ast.fix_missing_locations(ast.Expression(tree)), "<mathexpression>", 'eval')
+
+    return eval(code, dict(mathexpression.FOLDABLE_FUNCTIONS), variables)
+
+
+def count_calls(mathexpression, tree) -> int:
+    """count the calls of the given tree, the calls shared by many branches are counted once, like the nodes built"""
+    return sum(1 for n in mathexpression.walk_function_tree(tree) if isinstance(n, ast.Call))
+
+
+@pytest.mark.parametrize("expression, calls, saved", [
+    ("sin(a+b)*sin(a+b)", 5, 2),
+    ("(a+b)**2+(a+b)**2", 5, 2),
+    ("sqrt(a*a+b*b)/sqrt(a*a+b*b)", 9, 4),
+    ("a*b+b*a", 3, 0),
+    ])
+def test_eliminate_common_subexpressions(mathexpression, expression, calls, saved):
+
+    tree = transform(mathexpression, expression)
+    assert count_calls(mathexpression, tree) == calls
+    expected = evaluate(mathexpression, tree, a=0.3, b=1.7)
+
+    tree, count = mathexpression.eliminate_common_subexpressions(tree)
+    assert count == saved
+    assert count_calls(mathexpression, tree) == calls - saved
+    assert evaluate(mathexpression, tree, a=0.3, b=1.7) == expected
+
+
+@pytest.mark.parametrize("expression, calls, optimized", [
+    ("2*3*a+0", 3, "mult(6.0, a)"),
+    ("(a*2)*(b*3)", 3, "mult(mult(b, a), 6)"),
+    ("a-3-4", 2, "add(a, -7)"),
+    ("pow(b,0.5)", 1, "sqrt(b)"),
+    ("x**1", 1, "x"),
+    ])
+def test_optimize_function_tree(mathexpression, expression, calls, optimized):
+
+    tree = transform(mathexpression, expression)
+    assert count_calls(mathexpression, tree) == calls
+    expected = evaluate(mathexpression, tree, a=0.3, b=1.7, x=-2.5)
+
+    tree = mathexpression.optimize_function_tree(tree)
+    assert ast.unparse(tree) == optimized
+    assert count_calls(mathexpression, tree) <= calls
+    assert math.isclose(evaluate(mathexpression, tree, a=0.3, b=1.7, x=-2.5), expected, rel_tol=1e-12,)
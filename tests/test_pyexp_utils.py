@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+
+import math, random
+from types import SimpleNamespace
+
+import pytest
+
+mathutils = pytest.importorskip("mathutils")
+bpy = pytest.importorskip("bpy")
+
+
+@pytest.fixture
+def pyexp_utils(addon_module):
+    pyexp_utils = addon_module("utils.pyexp_utils")
+    pyexp_utils.clear_compile_cache()
+    yield pyexp_utils
+    pyexp_utils.clear_compile_cache()
+
+
+def evaluate(pyexp_utils, expression, **locals) -> object:
+    """evaluate the given expression the way a Python Expression node would"""
+    return eval(pyexp_utils.get_compiled_expression(expression), pyexp_utils.get_static_namespace(), locals,)
+
+
+def test_static_namespace_is_built_once(pyexp_utils):
+    assert pyexp_utils.get_static_namespace() is pyexp_utils.get_static_namespace()
+
+
+@pytest.mark.parametrize("expression", [
+    "sin(pi/4) + sqrt(2)",
+    "Vector((1,2,3)).length * floor(2.5)",
+    "max(scene, 2) + ceil(0.5)",
+    "[x**2 for x in range(scene)]",
+    ])
+def test_static_namespace_matches_a_fresh_namespace(pyexp_utils, expression):
+
+    #the namespace each evaluation used to build
+    namespace = {"scene": 5}
+    namespace.update(vars(random))
+    namespace.update(vars(mathutils))
+    namespace.update(vars(math))
+
+    assert evaluate(pyexp_utils, expression, scene=5) == eval(expression, namespace)
+
+
+def test_locals_are_not_leaking(pyexp_utils):
+
+    evaluate(pyexp_utils, "scene", scene=1)
+
+    assert "scene" not in pyexp_utils.get_static_namespace()
+    with pytest.raises(NameError):
+        evaluate(pyexp_utils, "scene")
+
+
+def test_compile_cache_hits(pyexp_utils):
+
+    first = pyexp_utils.get_compiled_expression("1+1")
+    assert pyexp_utils.get_compiled_expression("1+1") is first
+
+    stats = pyexp_utils.get_compile_cache_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_compile_cache_expand_macros(pyexp_utils):
+
+    scene = type("Scene", (), {"frame_current": 42})()
+
+    assert evaluate(pyexp_utils, "#frame*2", scene=scene) == 84
+
+
+def test_compile_cache_raise_syntax_errors(pyexp_utils):
+
+    with pytest.raises(SyntaxError):
+        pyexp_utils.get_compiled_expression("1+")
+
+
+def track(pyexp_utils, expression) -> tuple|None:
+    """evaluate the given expression with its reads tracked, return the read set a node would store.
+    the expressions read the factory startup file"""
+
+    tracker = pyexp_utils.ReadTracker()
+    namespace = {k:tracker.wrap(v) for k,v in {"bpy":bpy, "D":bpy.data, "C":bpy.context,}.items()}
+    eval(pyexp_utils.get_compiled_expression(expression), pyexp_utils.get_static_namespace(), namespace,)
+
+    node = SimpleNamespace(id_data=SimpleNamespace(name_full="NodeTree"), name="Python Expression")
+    pyexp_utils.set_read_set(node, tracker)
+    read_set = pyexp_utils.get_read_set(node)
+    pyexp_utils.clear_read_sets()
+
+    return read_set
+
+
+@pytest.mark.parametrize("expression", [
+    "D.objects['Cube'].location.x",
+    "bpy.data.objects['Cube'].location.x",
+    ])
+def test_read_tracking_records_items(pyexp_utils, expression):
+
+    read_set = track(pyexp_utils, expression)
+    assert ('OBJECT', 'Cube') in read_set[0]
+    assert not pyexp_utils.is_read_set_updated(read_set, {('OBJECT', 'Camera')})
+
+
+@pytest.mark.parametrize("expression", [
+    "len(D.objects)",
+    "'Cube' in bpy.data.objects",
+    "[o.name for o in D.objects]",
+    "D.objects.get('Missing')",
+    "C.scene.objects[0]",
+    ])
+def test_read_tracking_records_collections(pyexp_utils, expression):
+
+    read_set = track(pyexp_utils, expression)
+    assert pyexp_utils.is_read_set_updated(read_set, {('OBJECT', 'Missing')})
+    assert not pyexp_utils.is_read_set_updated(read_set, {('MATERIAL', 'Material')})
+
+
+def test_read_tracking_unknown_reads(pyexp_utils):
+    assert track(pyexp_utils, "bpy.ops is not None") is None
@@ -18,6 +18,7 @@ from .panels import (
     NODEBOOSTER_PT_tool_frame,
     NODEBOOSTER_PT_shortcuts_memo,
     NODEBOOSTER_PT_active_node,
+    NODEBOOSTER_PT_performance,
 
     )
 
@@ -31,6 +32,7 @@ classes = (
     NODEBOOSTER_PT_shortcuts_memo,
     NODEBOOSTER_PT_tool_frame,
     NODEBOOSTER_PT_active_node,
+    NODEBOOSTER_PT_performance,
 
     )
 
@@ -5,10 +5,16 @@
 
 import bpy 
 
+import os
+
 from bl_ui.properties_paint_common import BrushPanel
 
 from ..__init__ import get_addon_prefs
 from ..utils.str_utils import word_wrap
+from ..utils.perf_utils import get_all_stats, is_tracing
+from ..utils.cache_utils import get_cached_frames_count
+from ..utils.bake_utils import get_bake_filepath, get_bake_status
+from ..utils.pyexp_utils import get_compile_cache_stats, get_read_set, get_expression_kind
 
 
 class NODEBOOSTER_PT_active_node(bpy.types.Panel):
@@ -159,6 +165,12 @@ class NODEBOOSTER_PT_active_node(bpy.types.Panel):
                     row.enabled = False
                     row.prop(n, "debug_nodes_quantity", text="",)
 
+                    col = panel.column(align=True)
+                    col.label(text="NodesSaved:")
+                    row = col.row()
+                    row.enabled = False
+                    row.prop(n, "debug_nodes_saved", text="",)
+
                 col = layout.column(align=True)
                 op = col.operator("extranode.bake_customnode", text="Convert to Group",)
                 op.nodegroup_name = n.node_tree.name
@@ -186,6 +198,20 @@ class NODEBOOSTER_PT_active_node(bpy.types.Panel):
                     prop = panel.column()
                     prop.enabled = sett_win.allow_auto_exec
                     prop.prop(n,"execute_at_depsgraph")
+                    prop.prop(n,"use_read_tracking")
+
+                    col = panel.column(align=True)
+                    col.active = False
+
+                    match get_expression_kind(n.user_pyapiexp):
+                        case 'CONSTANT': col.label(text="Constant, Evaluated Once")
+                        case 'FRAME':    col.label(text="Evaluated on Frame Changes")
+                        case 'VOLATILE': col.label(text="Evaluated on Every Signal")
+                        case 'SCENE':
+                            read_set = get_read_set(n) if (n.use_read_tracking) else None
+                            if (read_set is not None):
+                                ids, is_time_dependent = read_set
+                                col.label(text=f"Depends on {len(ids)} Datablock(s)" + (" & Time" if (is_time_dependent) else ""))
                 
             
                 header, panel = layout.panel("prefs_panelid", default_closed=True,)
@@ -233,7 +259,7 @@ class NODEBOOSTER_PT_active_node(bpy.types.Panel):
                     col.label(text="Execution Count:")
                     row = col.row()
                     row.enabled = False
-                    row.prop(n, "debug_evaluation_counter", text="",)
+                    row.label(text=str(n.get_evaluation_count()),)
 
             case 'GeometryNodeNodeBoosterPythonScript':
                 pass
@@ -413,6 +439,108 @@ class NODEBOOSTER_PT_active_node(bpy.types.Panel):
         return None
 
 
+class NODEBOOSTER_PT_performance(bpy.types.Panel):
+    """statistics about the time spent in our handlers and booster nodes"""
+
+    bl_idname = "NODEBOOSTER_PT_performance"
+    bl_label = "Performance"
+    bl_category = "Node Booster"
+    bl_space_type = "NODE_EDITOR"
+    bl_region_type = "UI"
+    bl_order = 0
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return (context.space_data.type=='NODE_EDITOR') and (context.space_data.node_tree is not None)
+
+    def draw_stats_table(self, layout, stats, max_rows=15,):
+        """draw the given statistics, sorted by total time spent"""
+
+        if (not stats):
+            row = layout.row()
+            row.active = False
+            row.label(text="Nothing Recorded Yet")
+            return None
+
+        rows = [("Name","Mean","P95","Max","Count")]
+        ordered = sorted(stats.items(), key=lambda x: x[1]['mean']*x[1]['count'], reverse=True)
+        for (_, name), s in ordered[:max_rows]:
+            rows.append((name, f"{s['mean']*1000:.2f}", f"{s['p95']*1000:.2f}", f"{s['max']*1000:.2f}", str(s['count'])))
+
+        col = layout.column(align=True)
+        for i,(name, *values) in enumerate(rows):
+
+            split = col.split(factor=0.4)
+            split.active = (i!=0)
+            split.label(text=name)
+
+            row = split.row(align=True)
+            for v in values:
+                row.label(text=v)
+
+            continue
+
+        return None
+
+    def draw(self, context):
+
+        layout = self.layout
+        sett_plugin = get_addon_prefs()
+
+        row = layout.row(align=True)
+        row.prop(sett_plugin, "debug_timings",)
+        row.operator("nodebooster.clear_stats", text="", icon="TRASH",)
+
+        tracing = is_tracing()
+        layout.operator("nodebooster.trace_record", text="Stop & Write Trace" if (tracing) else "Record Trace", icon="REC" if (tracing) else "RENDER_ANIMATION", depress=tracing,)
+
+        layout.separator(type='LINE')
+
+        row = layout.row(align=True)
+        row.prop(sett_plugin, "use_frame_cache",)
+        row.operator("nodebooster.clear_frame_cache", text="", icon="TRASH",)
+
+        col = layout.column(align=True)
+        col.active = sett_plugin.use_frame_cache
+        col.operator("nodebooster.prime_frame_cache", text="Prime Frame Cache", icon="PREVIEW_RANGE",)
+        col.label(text=f"{get_cached_frames_count()} Frame Value(s) Cached")
+
+        layout.separator(type='LINE')
+
+        bake_filepath = get_bake_filepath()
+        row = layout.row(align=True)
+        row.operator("nodebooster.bake_outputs", text="Bake Outputs to Disk", icon="FILE_CACHE",)
+        row.operator("nodebooster.delete_bake", text="", icon="TRASH",)
+        if (not bake_filepath):
+            layout.label(text="Save your file first", icon="INFO",)
+        elif (os.path.exists(bake_filepath)):
+            if (get_bake_status()=='STALE'):
+                row = layout.row()
+                row.alert = True
+                row.label(text="Bake may be Stale, Bake Again", icon="ERROR",)
+            else:
+                layout.label(text=os.path.basename(bake_filepath), icon="CHECKMARK",)
+
+        if (not sett_plugin.debug_timings):
+            return None
+
+        for category, title in (('HANDLER',"Handlers (ms)"), ('NODE',"Nodes (ms)")):
+
+            header, panel = layout.panel(f"perfstats_{category.lower()}_panelid", default_closed=False,)
+            header.label(text=title,)
+            if (panel):
+                self.draw_stats_table(panel, get_all_stats(category),)
+
+        compiled = get_compile_cache_stats()
+        col = layout.column(align=True)
+        col.active = False
+        col.label(text=f"{compiled['size']} Python Expression(s) Compiled")
+        col.label(text=f"Compile Cache: {compiled['hits']} Hit(s), {compiled['misses']} Miss(es)")
+
+        return None
+
+
 class NODEBOOSTER_PT_tool_search(bpy.types.Panel):
     """search element within your node_tree"""
 
@@ -0,0 +1,636 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module precompute the loudness envelope of sounds datablocks, at frame resolution.
+#  decoding audio is expensive, we do it a single time per sound instead of on each frame.
+#  - envelopes are indexed in sound local frames, moving or trimming a strip doesn't require a new envelope.
+#  - envelopes are invalidated when their sound datablock is updated, and are keyed by fps.
+#  - envelope[i] is the level of the samples between sound local frames i and i+1.
+#  - the frequency bands amplitudes are computed the same way, with one hann windowed FFT per frame, in batches.
+#  - smoothing (moving average & attack/release) is applied on the whole arrays a single time per settings,
+#    so the per frame cost stays a lookup, and the results are identical on every render farm worker.
+#  - the analysis results are also stored on disk as .npy files, keyed by the sound file content hash & the analysis
+#    parameters, so other sessions or render farm workers can memory-map them instead of decoding the sounds again.
+#    the oldest used files are removed when the cache directory exceed the size set in the add-on preferences.
+#    if the cache directory can't be created or written, the analysis are only kept in memory.
+#  - in interactive sessions, sounds are decoded & analysed by a pool of worker threads, so the interface doesn't freeze.
+#    the strips closest to the playhead are analysed first, the ones ahead of the playhead before the ones behind.
+#    results are handed back to the main thread by a bpy.app.timers callback, until then the analysis are 'pending'.
+#    the workers are stopped when the add-on is unregistered, see stop_workers().
+#    in background mode, while rendering or baking, the analysis are done right away on the main thread.
+#  - worker threads never access bpy, everything they need is gathered on the main thread, see make_analysis_job().
+
+
+import bpy
+
+import os, hashlib, threading, queue, itertools, contextlib
+from collections import deque
+import numpy
+
+from .. import get_addon_prefs
+from .. import __package__ as base_package
+from .depsgraph_utils import get_id_key
+from .bake_utils import is_baking
+
+
+ENVELOPE_MODES = ('PEAK', 'RMS',)
+ANALYSIS_VERSION = 1 #increment when the analysis results change, so the disk cache is not reused
+
+BAND_MIN_FREQUENCY = 20.0
+BAND_MAX_FREQUENCY = 20_000.0
+
+WORKERS_COUNT = max(1, min(4, (os.cpu_count() or 2) - 1))
+RESULTS_POLL_INTERVAL = 0.1 #seconds between two checks of the workers results
+WORKERS_STOP_TIMEOUT = 2.0 #seconds we wait for each worker to finish its running job when stopping them
+BEHIND_PLAYHEAD_FACTOR = 4 #strips behind the playhead are less likely to be needed soon
+SMOOTHED_MAX = 8 #number of smoothed variations kept in memory per sound
+
+_ENVELOPES = {} #{(id_type, name_full, fps):{'PEAK':array, 'RMS':array, 'BANDS<count>':array, (analysis, window, attack, release):array},}
+_HASHES = {} #{(filepath, size, mtime):sha1,} protected by _LOCK, used by the workers
+
+_LOCK = threading.Lock()
+_QUEUE = queue.PriorityQueue() #(priority, order, job)
+_ORDER = itertools.count()
+_JOBS = {} #{(id_type, name_full, fps):job,} pending or running jobs
+_RESULTS = deque() #(job, {analysis:array}) waiting to be delivered on the main thread
+_WORKERS = []
+_ON_RESULTS = None #callback run on the main thread when new results are available
+
+
+def get_cache_directory() -> str|None:
+    """return the directory where the analysis results are stored, create it if needed. None if it can't be created"""
+
+    directory = bpy.path.abspath(get_addon_prefs().audio_cache_directory)
+
+    try:
+        if (not directory):
+            return bpy.utils.extension_path_user(base_package, path="audio_cache", create=True)
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        print(f"NodeBooster: Could not create audio cache directory '{directory}' {type(e).__name__}:\n{e}")
+        return None
+
+    return directory
+
+
+def get_file_hash(filepath:str) -> str|None:
+    """return a hash of the file content, None if it can't be read.
+    the hash of a file is computed a single time per session, unless the file is modified. thread safe"""
+
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    key = (filepath, stat.st_size, stat.st_mtime_ns)
+    with _LOCK:
+        digest = _HASHES.get(key)
+
+    #the file is read outside of the lock, two workers might hash the same file, it's harmless
+    if (digest is None):
+        sha = hashlib.sha1()
+        try:
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024*1024), b''):
+                    sha.update(chunk)
+        except OSError:
+            return None
+        digest = sha.hexdigest()
+        with _LOCK:
+            _HASHES[key] = digest
+
+    return digest
+
+
+def get_cache_filepath(name:str, directory:str) -> str:
+    return os.path.join(directory, f"{name}.npy")
+
+
+def load_cached_array(name:str, directory:str):
+    """memory-map the cached array of the given name, None if not cached. thread safe"""
+
+    filepath = get_cache_filepath(name, directory)
+    if (not os.path.exists(filepath)):
+        return None
+
+    try:
+        array = numpy.load(filepath, mmap_mode='r')
+    except Exception as e:
+        print(f"NodeBooster: Could not read audio cache '{filepath}' {type(e).__name__}:\n{e}")
+        return None
+
+    #least recently used files are evicted first, the file might be read-only, or removed by another worker
+    with contextlib.suppress(OSError):
+        os.utime(filepath)
+
+    return array
+
+
+def save_cached_array(name:str, array, directory:str, max_size:int,):
+    """store the given array on disk, and evict the least recently used files if the cache is larger than max_size bytes. thread safe"""
+
+    filepath = get_cache_filepath(name, directory)
+    temppath = f"{filepath}.{threading.get_ident()}.tmp.npy"
+    try:
+        numpy.save(temppath, array)
+        os.replace(temppath, filepath)
+    except OSError as e:
+        print(f"NodeBooster: Could not write audio cache '{filepath}' {type(e).__name__}:\n{e}")
+        return None
+
+    evict_cached_arrays(directory, max_size)
+
+    return None
+
+
+def evict_cached_arrays(directory:str, max_size:int):
+    """remove the least recently used files until the cache directory is smaller than the given size in bytes"""
+
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".npy"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(f[1] for f in files)
+    for _, size, path in sorted(files):
+        if (total <= max_size):
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+    return None
+
+
+def clear_cache_directory():
+    """remove all the analysis results stored on disk"""
+
+    directory = get_cache_directory()
+    if (directory is None):
+        return None
+
+    evict_cached_arrays(directory, 0)
+
+    return None
+
+
+def compute_envelopes(samples, samplerate:float, fps:float) -> dict:
+    """compute the per frame peak and rms levels of the given samples array of shape (n, channels)"""
+
+    if (samples.ndim==1):
+        samples = samples[:,None]
+
+    if (len(samples)==0):
+        return {mode: numpy.zeros(0, dtype=numpy.float32) for mode in ENVELOPE_MODES}
+
+    samples_per_frame = samplerate / fps
+    frames_count = int(numpy.ceil(len(samples) / samples_per_frame))
+    bounds = numpy.unique((numpy.arange(frames_count) * samples_per_frame).astype(numpy.int64))
+    counts = numpy.diff(numpy.append(bounds, len(samples)))
+
+    peaks = numpy.abs(samples).max(axis=1)
+    squares = numpy.square(samples, dtype=numpy.float64).mean(axis=1)
+
+    return {
+        'PEAK': numpy.maximum.reduceat(peaks, bounds).astype(numpy.float32),
+        'RMS': numpy.sqrt(numpy.add.reduceat(squares, bounds) / counts).astype(numpy.float32),
+        }
+
+
+def get_band_frequencies(band_count:int) -> list:
+    """return the (low, high) frequencies of the given number of log spaced bands, in Hz"""
+
+    edges = numpy.geomspace(BAND_MIN_FREQUENCY, BAND_MAX_FREQUENCY, band_count+1).tolist()
+
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def compute_band_energies(samples, samplerate:float, fps:float, band_count:int, chunk_size=1024,):
+    """compute the per frame amplitude of log spaced frequency bands of the given samples array of shape (n, channels).
+    each frame samples are hann windowed and transformed with a single batched FFT, return an array of shape (frames, band_count)"""
+
+    if (samples.ndim==1):
+        samples = samples[:,None]
+
+    samples_per_frame = samplerate / fps
+    frames_count = int(numpy.ceil(len(samples) / samples_per_frame))
+    if (frames_count==0) or (band_count==0):
+        return numpy.zeros((frames_count, band_count), dtype=numpy.float32)
+
+    mono = samples.mean(axis=1, dtype=numpy.float32)
+    window_size = max(int(samples_per_frame), 1)
+    fft_size = 1 << (window_size-1).bit_length()
+    window = numpy.hanning(window_size).astype(numpy.float32)
+    norm = 2.0 / window.sum() #a full scale sine should have an amplitude of ~1
+
+    #the last frames windows might read past the end of the sound
+    padded = numpy.concatenate((mono, numpy.zeros(window_size, dtype=numpy.float32)))
+    starts = (numpy.arange(frames_count) * samples_per_frame).astype(numpy.int64)
+    offsets = numpy.arange(window_size)
+
+    #the range of FFT bins of each band, at least one bin per band. bands above nyquist are silent
+    freqs = numpy.fft.rfftfreq(fft_size, d=1/samplerate)
+    edges = numpy.geomspace(BAND_MIN_FREQUENCY, BAND_MAX_FREQUENCY, band_count+1)
+    audible = edges[:-1] < freqs[-1]
+    lo = numpy.minimum(numpy.searchsorted(freqs, edges[:-1]), len(freqs)-1)
+    hi = numpy.clip(numpy.searchsorted(freqs, edges[1:]), lo+1, len(freqs))
+
+    result = numpy.empty((frames_count, band_count), dtype=numpy.float32)
+
+    for i in range(0, frames_count, chunk_size):
+        chunk = padded[starts[i:i+chunk_size,None] + offsets[None,:]] * window
+        power = numpy.square(numpy.abs(numpy.fft.rfft(chunk, n=fft_size, axis=1)) * norm)
+        cumsum = numpy.concatenate((numpy.zeros((len(chunk),1)), power.cumsum(axis=1)), axis=1)
+        result[i:i+chunk_size] = numpy.sqrt(cumsum[:,hi] - cumsum[:,lo]) * audible
+
+    return result
+
+
+def compute_analysis(samples, samplerate:float, fps:float, analysis:str):
+    """compute the given analysis, either 'PEAK', 'RMS' or 'BANDS<count>'"""
+
+    if analysis.startswith('BANDS'):
+        return compute_band_energies(samples, samplerate, fps, int(analysis[5:]))
+
+    return compute_envelopes(samples, samplerate, fps)[analysis]
+
+
+def smooth_moving_average(array, window:int,):
+    """centered moving average over the given number of frames, along the first axis. the sound is silent outside of its range"""
+
+    if (window<=1) or (len(array)==0):
+        return array
+
+    before = window//2
+    after = window-1-before
+    padded = numpy.concatenate((numpy.zeros((before, *array.shape[1:])), array, numpy.zeros((after, *array.shape[1:]))), axis=0)
+    cumsum = numpy.concatenate((numpy.zeros((1, *array.shape[1:])), numpy.cumsum(padded, axis=0)), axis=0)
+
+    return ((cumsum[window:] - cumsum[:-window]) / window).astype(numpy.float32)
+
+
+def smooth_attack_release(array, attack:float, release:float,):
+    """one-pole envelope follower along the first axis, rising with the attack & falling with the release time constants, in frames"""
+
+    if ((attack<=0) and (release<=0)) or (len(array)==0):
+        return array
+
+    a = (1.0 - numpy.exp(-1.0/attack)) if (attack>0) else 1.0
+    r = (1.0 - numpy.exp(-1.0/release)) if (release>0) else 1.0
+
+    #an IIR pass can't be vectorized over time, but it's run a single time per sound & settings
+    if (array.ndim==1):
+        out = []
+        y = 0.0
+        for x in array.tolist():
+            y += (x-y) * (a if (x>y) else r)
+            out.append(y)
+        return numpy.array(out, dtype=numpy.float32)
+
+    out = numpy.empty(array.shape, dtype=numpy.float32)
+    y = numpy.zeros(array.shape[1:], dtype=numpy.float32)
+    for i,x in enumerate(array):
+        y += (x-y) * numpy.where(x>y, a, r)
+        out[i] = y
+
+    return out
+
+
+def get_smoothed_analysis(sound, fps:float, analysis:str, window=1, attack=0.0, release=0.0, priority=0,):
+    """get the given analysis of a sound datablock, smoothed with a moving average window then an attack/release follower.
+    the smoothed arrays are stored along the analysis, None is returned if the analysis is pending"""
+
+    array = get_sound_analysis(sound, fps, analysis, priority=priority,)
+    if (array is None) or ((window<=1) and (attack<=0) and (release<=0)):
+        return array
+
+    results = _ENVELOPES[(*get_id_key(sound), fps)]
+    smooth_key = (analysis, window, round(attack,4), round(release,4))
+
+    smoothed = results.get(smooth_key)
+    if (smoothed is None):
+
+        #tweaking the settings would fill up the memory, we keep the last few ones
+        smooth_keys = [k for k in results if isinstance(k, tuple)]
+        for k in smooth_keys[:len(smooth_keys)-SMOOTHED_MAX+1]:
+            del results[k]
+
+        smoothed = results[smooth_key] = smooth_attack_release(smooth_moving_average(array, window), attack, release)
+
+    return smoothed
+
+
+def get_sound_envelope(sound, fps:float, mode='PEAK', window=1, attack=0.0, release=0.0, priority=0,):
+    """get the envelope of the given sound datablock, None if the analysis is pending"""
+    return get_smoothed_analysis(sound, fps, mode, window=window, attack=attack, release=release, priority=priority,)
+
+
+def get_sound_bands(sound, fps:float, band_count:int, window=1, attack=0.0, release=0.0, priority=0,):
+    """get the frequency bands amplitudes of the given sound datablock, None if the analysis is pending"""
+    return get_smoothed_analysis(sound, fps, f'BANDS{band_count}', window=window, attack=attack, release=release, priority=priority,)
+
+
+def is_synchronous_analysis_required() -> bool:
+    """some situations can't wait for our workers, the values need to be correct right away"""
+    return bpy.app.background or bpy.app.is_job_running('RENDER') or is_baking()
+
+
+def get_sound_analysis(sound, fps:float, analysis:str, priority=0,):
+    """get the given analysis of a sound datablock. the analysis is read from memory, or from the disk cache,
+    or computed. in interactive sessions it's computed by our workers, None is returned until it's ready"""
+
+    key = (*get_id_key(sound), fps)
+
+    results = _ENVELOPES.get(key)
+    if (results is not None) and (analysis in results):
+        return results[analysis]
+
+    if is_synchronous_analysis_required():
+        _ENVELOPES.setdefault(key, {}).update(run_analysis_job(make_analysis_job(sound, fps, {analysis},)))
+        return _ENVELOPES[key][analysis]
+
+    if (not is_analysis_queued(key, analysis, priority)):
+        request_analysis_job(make_analysis_job(sound, fps, {analysis},), priority)
+
+    return None
+
+
+def is_analysis_queued(key, analysis:str, priority=0,) -> bool:
+    """check if the analysis is already queued with the same or a better priority, or running"""
+
+    with _LOCK:
+        queued = _JOBS.get(key)
+        if (queued is None):
+            return False
+        if (queued['started']):
+            return True
+        return (analysis in queued['analyses']) and (queued['priority'] <= priority)
+
+
+def make_analysis_job(sound, fps:float, analyses:set,) -> dict:
+    """gather everything needed to analyse the given sound, workers can't access bpy"""
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    sett_plugin = get_addon_prefs()
+
+    return {
+        'key': (*get_id_key(sound), fps),
+        'name': sound.name,
+        'fps': fps,
+        'analyses': set(analyses),
+        'factory': sound.evaluated_get(depsgraph).factory,
+        'filepath': bpy.path.abspath(sound.filepath, library=sound.library) if (sound.packed_file is None) else None,
+        'packed': sound.packed_file.data if (sound.packed_file is not None) else None,
+        'channels': "mono" if (sound.use_mono) else "stereo",
+        'directory': get_cache_directory(),
+        'max_size': sett_plugin.audio_cache_size * 1024 * 1024,
+        'started': False,
+        }
+
+
+def run_analysis_job(job) -> dict:
+    """read the analysis of the job sound from the disk cache, or decode the sound & store them. return {analysis:array}. thread safe"""
+
+    if (job['packed'] is not None):
+          digest = hashlib.sha1(job['packed']).hexdigest()
+    else: digest = get_file_hash(job['filepath'])
+
+    prefix = f"{digest}_v{ANALYSIS_VERSION}_{job['channels']}_{job['fps']:.4f}fps"
+
+    #without a hash or a cache directory, the analysis are only kept in memory
+    use_disk_cache = (digest is not None) and (job['directory'] is not None)
+
+    results = {}
+    missing = []
+    for analysis in job['analyses']:
+        array = load_cached_array(f"{prefix}_{analysis}", job['directory']) if (use_disk_cache) else None
+        if (array is None):
+              missing.append(analysis)
+        else: results[analysis] = array
+
+    if (not missing):
+        return results
+
+    try:
+        samples, samplerate = job['factory'].data(), job['factory'].specs[0]
+    except Exception as e:
+        print(f"NodeBooster: Could not decode sound '{job['name']}' {type(e).__name__}:\n{e}")
+        samples, samplerate = numpy.zeros((0,1), dtype=numpy.float32), 1.0
+
+    for analysis in missing:
+        array = results[analysis] = compute_analysis(samples, samplerate, job['fps'], analysis)
+
+        #an empty result might be a decoding failure, we don't want to keep it
+        if (use_disk_cache) and len(array):
+            save_cached_array(f"{prefix}_{analysis}", array, job['directory'], job['max_size'],)
+
+    return results
+
+
+def request_analysis_job(job, priority=0,):
+    """queue the given job for our workers, lowest priority first. if the sound is already queued, the job is merged"""
+
+    with _LOCK:
+
+        queued = _JOBS.get(job['key'])
+
+        if (queued is not None):
+            #too late, the next request will queue the missing analysis
+            if (queued['started']):
+                return None
+            if (job['analyses'] <= queued['analyses']) and (queued['priority'] <= priority):
+                return None
+            queued['analyses'] |= job['analyses']
+            job = queued
+
+        job['priority'] = min(priority, job.get('priority', priority))
+        _JOBS[job['key']] = job
+
+    #a job might be queued multiple times with different priorities, workers only run it once
+    _QUEUE.put((job['priority'], next(_ORDER), job))
+
+    ensure_workers()
+
+    if (not bpy.app.timers.is_registered(deliver_analysis_results)):
+        bpy.app.timers.register(deliver_analysis_results, first_interval=RESULTS_POLL_INTERVAL,)
+
+    return None
+
+
+def prefetch_sound_analysis(sound, fps:float, analysis:str, distance:float,):
+    """request the analysis of a sound ahead of time, distance is the number of frames between the playhead & the strip, negative if behind"""
+
+    key = (*get_id_key(sound), fps)
+
+    results = _ENVELOPES.get(key)
+    if (results is not None) and (analysis in results):
+        return None
+
+    if is_synchronous_analysis_required():
+        return None
+
+    priority = distance if (distance>=0) else (-distance * BEHIND_PLAYHEAD_FACTOR)
+    if (not is_analysis_queued(key, analysis, priority)):
+        request_analysis_job(make_analysis_job(sound, fps, {analysis},), priority)
+
+    return None
+
+
+def worker_loop():
+    """our worker threads run the queued jobs, until they receive a stop sentinel, see stop_workers()"""
+
+    while True:
+        _, _, job = _QUEUE.get()
+
+        if (job is None):
+            return None
+
+        with _LOCK:
+            #already done by another worker, or discarded
+            if (job['started']) or (_JOBS.get(job['key']) is not job):
+                continue
+            job['started'] = True
+
+        try:
+            results = run_analysis_job(job)
+        except Exception as e:
+            print(f"NodeBooster: Sound analysis failed for '{job['name']}' {type(e).__name__}:\n{e}")
+            results = {}
+
+        _RESULTS.append((job, results))
+
+        continue
+
+
+def ensure_workers():
+    """start our worker threads, if not done already"""
+
+    if (_WORKERS):
+        return None
+
+    for i in range(WORKERS_COUNT):
+        t = threading.Thread(target=worker_loop, name=f"NodeBoosterAudio{i}", daemon=True,)
+        t.start()
+        _WORKERS.append(t)
+
+    return None
+
+
+def stop_workers():
+    """stop our worker threads, the queued jobs are discarded, the running ones are waited for a little while"""
+
+    if (not _WORKERS):
+        return None
+
+    with _LOCK:
+        _JOBS.clear()
+
+    #the stop sentinels are sorted before any job
+    with contextlib.suppress(queue.Empty):
+        while True:
+            _QUEUE.get_nowait()
+    for _ in _WORKERS:
+        _QUEUE.put((float('-inf'), next(_ORDER), None))
+
+    for t in _WORKERS:
+        t.join(WORKERS_STOP_TIMEOUT)
+
+    _WORKERS.clear()
+    _RESULTS.clear()
+
+    return None
+
+
+def set_results_callback(callback):
+    """set the function called on the main thread when new analysis are available"""
+
+    global _ON_RESULTS
+    _ON_RESULTS = callback
+
+    return None
+
+
+def deliver_analysis_results():
+    """timer callback, store the workers results on the main thread"""
+
+    delivered = False
+
+    while (_RESULTS):
+        job, results = _RESULTS.popleft()
+
+        with _LOCK:
+            #the sound was updated while it was analysed, the results are discarded
+            if (_JOBS.get(job['key']) is not job):
+                continue
+            del _JOBS[job['key']]
+
+        _ENVELOPES.setdefault(job['key'], {}).update(results)
+        delivered = True
+
+        continue
+
+    if (delivered and _ON_RESULTS):
+        _ON_RESULTS()
+
+    #returning None will unregister the timer, the next request will register it again
+    if (not _JOBS) and (not _RESULTS):
+        return None
+
+    return RESULTS_POLL_INTERVAL
+
+
+def is_analysis_pending(sound, fps:float, analysis:str,) -> bool:
+    """check if the given analysis is not available yet"""
+
+    results = _ENVELOPES.get((*get_id_key(sound), fps))
+
+    return (results is None) or (analysis not in results)
+
+
+def get_envelope_value(envelope, index:int) -> float:
+    """read the level at the given envelope index, 0 if out of range"""
+
+    if (0 <= index < len(envelope)):
+        return float(envelope[index])
+
+    return 0.0
+
+
+def get_bands_row(bands, index:int):
+    """read the bands amplitudes at the given frame index, zeros if out of range"""
+
+    if (0 <= index < len(bands)):
+        return bands[index]
+
+    return numpy.zeros(bands.shape[1], dtype=numpy.float32)
+
+
+def invalidate_envelopes(updated_ids):
+    """forget about the envelopes of the updated sounds keys, and discard their running analysis"""
+
+    for key in [k for k in _ENVELOPES if (k[:2] in updated_ids)]:
+        del _ENVELOPES[key]
+
+    with _LOCK:
+        for key in [k for k in _JOBS if (k[:2] in updated_ids)]:
+            del _JOBS[key]
+
+    return None
+
+
+def clear_envelopes():
+    """forget about all envelopes, and discard all running analysis"""
+
+    _ENVELOPES.clear()
+
+    with _LOCK:
+        _JOBS.clear()
+
+    return None
@@ -0,0 +1,257 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module read & write the outputs values of our time-varying booster nodes, baked over the scene frame range,
+#  to a sidecar file next to the .blend. it's meant for render farms, where each frame is rendered by a different
+#  'blender -b' worker, the workers can read the values of their frame instead of evaluating the nodes.
+#  - the baked values are only read in background mode, an interactive session always evaluate the nodes live.
+#  - a node baked value is ignored if the node settings changed since the bake, see the 'get_bake_signature' node methods.
+#  - the whole bake is ignored if the scene changed since the bake, see get_scene_fingerprint(). the fingerprint only
+#    cover the data our nodes commonly depend on, the animations, cameras, objects transforms & sound strips.
+#    hashing the scene is O(objects + keyframes), it's only done when the bake is loaded, the result is kept until
+#    the file is saved or baked again.
+#  - a frame can hold NaN values, if the node could not be baked on this frame, it is then evaluated live.
+#  - file layout: magic, header size (uint32), json header, padding, then the float64 values node by node,
+#    the values of a node are stored frame by frame.
+
+
+import bpy
+
+import os, json, struct, hashlib
+import numpy
+
+from .registry_utils import get_node_key
+from .sequencer_utils import get_volume_fcurve
+
+
+BAKE_MAGIC = b"NBBAKE01"
+BAKE_EXTENSION = ".nbbake"
+BAKE_ALIGNMENT = 64 #values are aligned in the file, so they can be memory-mapped efficiently
+
+_BAKE = None #the loaded bake, {'filepath','frame_start','frame_end','fingerprint','is_stale','values','nodes':{node_key:(offset,width,signature),},}
+_IS_LOADED = False
+_IS_BAKING = False
+
+
+def get_bake_filepath() -> str:
+    """return the sidecar filepath of the current .blend, empty if the file is not saved"""
+
+    if (not bpy.data.filepath):
+        return ""
+
+    return os.path.splitext(bpy.data.filepath)[0] + BAKE_EXTENSION
+
+
+def set_baking(state:bool):
+    """we don't want to read the previous bake while we are baking"""
+
+    global _IS_BAKING
+    _IS_BAKING = bool(state)
+
+    return None
+
+
+def is_baking() -> bool:
+    return _IS_BAKING
+
+
+def is_bake_readable() -> bool:
+    """check if the baked values should be used instead of evaluating the nodes"""
+    return bpy.app.background and (not _IS_BAKING)
+
+
+def get_scene_fingerprint(scene) -> str:
+    """hash the static data of the given scene our baked values likely depend on. the animated values are excluded,
+    as they vary from frame to frame, but their animation keyframes are included.
+    the frame range is excluded as well, render farm workers might override it"""
+
+    h = hashlib.sha1()
+    feed = lambda *values: h.update(repr(values).encode('utf-8'))
+
+    feed(scene.render.fps, scene.render.fps_base, scene.render.resolution_x, scene.render.resolution_y,
+         scene.camera.name_full if (scene.camera) else None,)
+
+    for action in sorted(bpy.data.actions, key=lambda a: a.name_full):
+        feed(action.name_full)
+        for fc in action.fcurves:
+            co = numpy.empty(len(fc.keyframe_points)*2, dtype=numpy.float32)
+            fc.keyframe_points.foreach_get('co', co)
+            feed(fc.data_path, fc.array_index, fc.mute, co.tobytes())
+
+    for obj in sorted(bpy.data.objects, key=lambda o: o.name_full):
+        feed(obj.name_full, obj.parent.name_full if (obj.parent) else None,
+             [(c.type, c.mute, getattr(c,'target',None) and c.target.name_full) for c in obj.constraints],)
+        if (obj.animation_data is None):
+            feed(tuple(map(tuple, obj.matrix_basis)))
+        if (obj.type=='CAMERA') and (obj.data.animation_data is None):
+            cam = obj.data
+            feed(cam.angle, cam.shift_x, cam.shift_y, cam.clip_start, cam.clip_end)
+
+    if (scene.sequence_editor is not None):
+        for strip in scene.sequence_editor.sequences_all:
+            if (strip.type!='SOUND'):
+                continue
+            feed(strip.name, strip.channel, strip.mute, strip.frame_start, strip.frame_offset_start, strip.frame_offset_end,
+                 strip.sound.filepath if (strip.sound) else None,)
+            if (get_volume_fcurve(scene, strip) is None):
+                feed(strip.volume)
+
+    return h.hexdigest()
+
+
+def write_bake(filepath:str, frame_start:int, frame_end:int, fingerprint:str, entries:list,):
+    """write the given entries to a sidecar bake file, the fingerprint is the state of the scene when baked, see get_scene_fingerprint().
+    each entry is a dict {'node':node, 'signature':str, 'values':numpy array of shape (frames, width)}"""
+
+    header = {
+        "version": 2,
+        "frame_start": frame_start,
+        "frame_end": frame_end,
+        "fingerprint": fingerprint,
+        "nodes": [],
+        }
+
+    offset = 0
+    for e in entries:
+        tree_name, node_name = get_node_key(e['node'])
+        width = e['values'].shape[1]
+        header["nodes"].append({
+            "tree": tree_name,
+            "node": node_name,
+            "signature": e['signature'],
+            "offset": offset,
+            "width": width,
+            })
+        offset += e['values'].size
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_offset = len(BAKE_MAGIC) + 4 + len(header_bytes)
+    padding = (-data_offset) % BAKE_ALIGNMENT
+
+    #write to a temporary file first, a worker might be reading the previous bake
+    temppath = filepath + ".tmp"
+    with open(temppath, 'wb') as f:
+        f.write(BAKE_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * padding)
+        for e in entries:
+            f.write(numpy.ascontiguousarray(e['values'], dtype='<f8').tobytes())
+
+    os.replace(temppath, filepath)
+
+    #the loaded bake is outdated
+    clear_bake()
+
+    return None
+
+
+def load_bake(filepath:str) -> dict|None:
+    """read the header of the given bake file and memory-map its values, return None if the file is missing or invalid"""
+
+    if (not os.path.exists(filepath)):
+        return None
+
+    try:
+        with open(filepath, 'rb') as f:
+            if (f.read(len(BAKE_MAGIC)) != BAKE_MAGIC):
+                raise ValueError("not a bake file")
+            header_size, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_size).decode('utf-8'))
+
+        data_offset = len(BAKE_MAGIC) + 4 + header_size
+        data_offset += (-data_offset) % BAKE_ALIGNMENT
+
+        count = sum(((header["frame_end"]-header["frame_start"]+1) * n["width"]) for n in header["nodes"])
+        values = numpy.memmap(filepath, dtype='<f8', mode='r', offset=data_offset, shape=(count,),) if (count) else numpy.empty(0)
+
+    except Exception as e:
+        print(f"NodeBooster: Could not read bake file '{filepath}' {type(e).__name__}:\n{e}")
+        return None
+
+    return {
+        'filepath': filepath,
+        'frame_start': header["frame_start"],
+        'frame_end': header["frame_end"],
+        'fingerprint': header.get("fingerprint"),
+        'values': values,
+        'nodes': {(n["tree"], n["node"]): (n["offset"], n["width"], n["signature"]) for n in header["nodes"]},
+        }
+
+
+def get_bake() -> dict|None:
+    """return the bake of the current .blend, loaded lazily a single time"""
+
+    global _BAKE, _IS_LOADED
+
+    if (not _IS_LOADED):
+        _BAKE = load_bake(get_bake_filepath())
+        _IS_LOADED = True
+
+        #the scene is hashed a single time per load, see clear_bake()
+        if (_BAKE is not None):
+            _BAKE['is_stale'] = (_BAKE['fingerprint'] != get_scene_fingerprint(bpy.context.scene))
+            if (_BAKE['is_stale']):
+                print(f"NodeBooster: The bake file '{_BAKE['filepath']}' was made from a different scene state, it will be ignored. Please bake again.")
+
+    return _BAKE
+
+
+def get_bake_status() -> str:
+    """return 'NONE' if there's no bake for the current .blend, 'STALE' if it was made from a different scene state, or 'VALID'.
+    the staleness is checked when the bake is loaded, not on each call"""
+
+    bake = get_bake()
+    if (bake is None):
+        return 'NONE'
+
+    return 'STALE' if (bake['is_stale']) else 'VALID'
+
+
+def clear_bake():
+    """forget about the loaded bake, it will be loaded again on next access"""
+
+    global _BAKE, _IS_LOADED
+    _BAKE = None
+    _IS_LOADED = False
+
+    return None
+
+
+def get_baked_row(node, frame:int) -> list|None:
+    """return the baked values of the given node for the given frame, None if missing or stale"""
+
+    bake = get_bake()
+    if (bake is None) or (bake['is_stale']):
+        return None
+
+    entry = bake['nodes'].get(get_node_key(node))
+    if (entry is None):
+        return None
+
+    offset, width, signature = entry
+    if (signature != node.get_bake_signature()):
+        return None
+
+    if not (bake['frame_start'] <= frame <= bake['frame_end']):
+        return None
+
+    idx = offset + (frame-bake['frame_start'])*width
+    row = bake['values'][idx:idx+width]
+    if numpy.isnan(row).any():
+        return None
+
+    return row.tolist()
+
+
+def apply_baked_row(node, frame:int) -> bool:
+    """set the outputs of the given node from its baked values, return False if there's none for this frame"""
+
+    row = get_baked_row(node, frame)
+    if (row is None):
+        return False
+
+    node.set_bake_row(row)
+
+    return True
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module store the outputs values our time-varying booster nodes computed for a given frame,
+#  so playing the same frame range again can write the values straight from memory.
+#  - the cache of a node is invalidated when the datablocks it depends on are updated, see 'is_dependent' node methods.
+#  - all caches are cleared on file load, undo and redo, as the values might reference freed datablocks.
+
+
+from .registry_utils import get_node_key
+
+
+FRAME_CACHE_MAX = 100_000 #maximal number of frames cached per node
+
+_FRAME_CACHE = {} #{node_key:{frame_key:values,},}
+
+
+def get_frame_key(scene) -> tuple:
+    """return a hashable key identifying the current frame and subframe of the given scene"""
+    return (scene.name, scene.frame_current, round(scene.frame_subframe,4))
+
+
+def get_cached_values(node, frame_key):
+    """return the cached output values of the node for the given frame, or None"""
+
+    cache = _FRAME_CACHE.get(get_node_key(node))
+    if (cache is None):
+        return None
+
+    return cache.get(frame_key)
+
+
+def set_cached_values(node, frame_key, values):
+    """store the output values of the node for the given frame"""
+
+    cache = _FRAME_CACHE.setdefault(get_node_key(node), {})
+    if (len(cache) < FRAME_CACHE_MAX):
+        cache[frame_key] = values
+
+    return None
+
+
+def get_frame_values(node, frame_key, evaluate):
+    """return the output values of the node for the given frame, from the cache if possible,
+    otherwise from the given evaluate() function, its result is cached if not None.
+    if frame_key is None, the cache is skipped"""
+
+    if (frame_key is None):
+        return evaluate()
+
+    values = get_cached_values(node, frame_key)
+    if (values is None):
+        values = evaluate()
+        if (values is not None):
+            set_cached_values(node, frame_key, values)
+
+    return values
+
+
+def invalidate_frame_cache(node):
+    """forget about the cached values of the given node"""
+
+    _FRAME_CACHE.pop(get_node_key(node), None)
+
+    return None
+
+
+def clear_frame_cache():
+    """forget about all the cached values"""
+
+    _FRAME_CACHE.clear()
+
+    return None
+
+
+def get_cached_frames_count(node=None) -> int:
+    """return the number of frames cached, for the given node or for all nodes"""
+
+    if (node is not None):
+        return len(_FRAME_CACHE.get(get_node_key(node), ()))
+
+    return sum(len(c) for c in _FRAME_CACHE.values())
@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module help our handlers understand what changed on a depsgraph signal.
+#  the updated datablocks are represented as (id_type, name_full) keys, these are safe to store
+#  and compare between signals, unlike ID python objects.
+#  - when our nodes write their outputs values, blender also tags the node_groups containing them, and the objects
+#    using these, the next depsgraph signal will carry these updates. we record our own writes, so our handlers can
+#    ignore their consequences, otherwise our nodes would trigger themselves. see users_utils.get_own_writes_consequences()
+
+
+import bpy
+
+
+#all our booster nodes are using a copy of a nodegroup starting with this name.
+BOOSTER_NG_PREFIX = ".GeometryNodeNodeBooster"
+
+_OWN_WRITES = set() #name_full of our booster nodegroups written since the last depsgraph signal
+
+
+def get_id_key(idb) -> tuple:
+    """return a hashable key identifying the given ID datablock"""
+    return (idb.id_type, idb.name_full)
+
+
+def get_id_from_name_full(collection, name_full:str):
+    """return the ID of the given bpy.data collection from its name_full, None if not found.
+    a local & a linked ID can share the same name, the linked IDs name_full are suffixed by their library"""
+
+    idb = collection.get(name_full)
+    if (idb is not None) and (idb.name_full==name_full):
+        return idb
+
+    #linked IDs can't be found from their name_full directly
+    for idb in collection:
+        if (idb.name_full==name_full):
+            return idb
+
+    return None
+
+
+def is_booster_nodegroup(idb) -> bool:
+    """check if the given ID is one of the nodegroup used internally by our booster nodes"""
+    return (idb.id_type=='NODETREE') and idb.name.startswith(BOOSTER_NG_PREFIX)
+
+
+def tag_own_write(ng):
+    """record that we just wrote the outputs values of the given booster nodegroup"""
+
+    _OWN_WRITES.add(ng.name_full)
+
+    return None
+
+
+def pop_own_writes() -> set:
+    """return the name_full of the booster nodegroups written since the last call, and forget about them"""
+
+    written = _OWN_WRITES.copy()
+    _OWN_WRITES.clear()
+
+    return written
+
+
+def get_updated_ids(depsgraph, ignored=None,) -> set:
+    """gather the keys of the original IDs updated in the given depsgraph.
+    Updates of our own booster nodegroups are discarded, these are caused by our nodes writing their own outputs values.
+    optionally pass the keys of the IDs updated as a consequence of these writes, they are discarded as well,
+    unless an object was also moved"""
+
+    updated_ids = set()
+
+    for update in depsgraph.updates:
+        idb = update.id.original
+        if is_booster_nodegroup(idb):
+            continue
+        key = get_id_key(idb)
+        if (ignored) and (key in ignored) and (not update.is_updated_transform):
+            continue
+        updated_ids.add(key)
+
+    return updated_ids
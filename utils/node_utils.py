@@ -3,15 +3,13 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 
-#TODO Optimization: node_utils function should check if value or type isn't already set before setting it.
-
-
 import bpy 
 
 from math import hypot
 from mathutils import Vector
 
 from .draw_utils import get_dpifac
+from .depsgraph_utils import tag_own_write
 
 
 def get_node_absolute_location(node):
@@ -92,12 +90,47 @@ def get_socket_defvalue(ng, idx, in_out='OUTPUT',):
             raise Exception("get_socket_defvalue(): in_out arg not valid")
 
 
-def set_socket_defvalue(ng, idx=None, socket=None, in_out='OUTPUT', value=None, node=None,):
-    """set the value of the given nodegroups inputs or output sockets"""
+def is_same_value(current, value, tolerance=1e-6,) -> bool:
+    """type-aware equality check between a socket current value and a new value.
+    floats are compared with a tolerance, arrays element-wise, and IDs by pointer"""
+
+    match value:
+
+        case None:
+            return (current is None)
+
+        case bpy.types.ID():
+            #bpy_struct equality is comparing the pointers
+            return (current is not None) and (current==value)
+
+        case str() | bool():
+            return (current==value)
+
+        case int() | float():
+            if (not isinstance(current, (int, float))):
+                return False
+            return (abs(current-value) <= tolerance)
+
+        case _:
+            #vectors, colors, quaternions, matrices..
+            try:
+                if (len(current)!=len(value)):
+                    return False
+                return all(is_same_value(c, v, tolerance=tolerance) for c,v in zip(current, value))
+            except TypeError:
+                return (current==value)
+
+
+def set_socket_defvalue(ng, idx=None, socket=None, in_out='OUTPUT', value=None, node=None,) -> bool:
+    """set the value of the given nodegroups inputs or output sockets.
+    the values are only written if they differ from the current ones, as writing a value will trigger a re-evaluation of the trees using this nodegroup.
+    return True if something changed"""
     
     assert in_out in {'INPUT','OUTPUT'}, "set_socket_defvalue(): in_out arg not valid"
     assert not (idx is None and socket is None), "Please pass either a socket or an index to a socket"
 
+    changed = False
+
     # setting a default value of a input is very different from an output.
     #  - set a defaultval input can only be done by changing all node instances input of that nodegroup..
     #  - set a defaultval output can be done within the ng
@@ -126,12 +159,16 @@ def set_socket_defvalue(ng, idx=None, socket=None, in_out='OUTPUT', value=None,
                     defnod = ng.nodes.new('FunctionNodeQuaternionToRotation')
                     defnod.name = defnod.label = defnodname
                     defnod.location = (outnod.location.x, outnod.location.y + 150)
+                    changed = True
                 #link it
                 if (not socket.links):
                     ng.links.new(defnod.outputs[0], socket)
+                    changed = True
                 #assign values
                 for inpt,val in zip(defnod.inputs, value):
-                    inpt.default_value = val
+                    if (not is_same_value(inpt.default_value, val)):
+                        inpt.default_value = val
+                        changed = True
 
             case 'MATRIX':
                 defnodname = f"DEFVAL{idx}_{socket.type}"
@@ -144,20 +181,27 @@ def set_socket_defvalue(ng, idx=None, socket=None, in_out='OUTPUT', value=None,
                     #the node comes with tainted default values
                     for inp in defnod.inputs:
                         inp.default_value = 0
+                    changed = True
                 #link it 
                 if (not socket.links):
                     ng.links.new(defnod.outputs[0], socket)
+                    changed = True
                 #assign flatten values
                 for inpt,val in zip(defnod.inputs, [val for row in value for val in row] ):
-                    inpt.default_value = val
+                    if (not is_same_value(inpt.default_value, val)):
+                        inpt.default_value = val
+                        changed = True
 
             case _:
                 #we remove any unwanted links, if exists
                 if (socket.links):
                     for l in socket.links:
                         ng.links.remove(l)
+                    changed = True
                 #we set def value, simply..
-                socket.default_value = value
+                if (not is_same_value(socket.default_value, value)):
+                    socket.default_value = value
+                    changed = True
 
     elif (in_out=='INPUT'):
         
@@ -172,16 +216,23 @@ def set_socket_defvalue(ng, idx=None, socket=None, in_out='OUTPUT', value=None,
         
         instancesocket = node.inputs[idx]
         if (instancesocket.type not in {'ROTATION','MATRIX'}):
-            instancesocket.default_value = value
+            if (not is_same_value(instancesocket.default_value, value)):
+                instancesocket.default_value = value
+                changed = True
+
+    #blender will send a depsgraph signal for the trees & objects using this nodegroup, our handlers need to know it's us
+    if (changed):
+        tag_own_write(ng)
             
-    return None
+    return changed
 
 
 def set_socket_label(ng, idx, in_out='OUTPUT', label=None,):
     """return the label of the given nodegroups output at given socket idx"""
     
     itm = get_socketui_from_socket_idx(ng, idx, in_out=in_out,)
-    itm.name = str(label)
+    if (itm.name!=str(label)):
+        itm.name = str(label)
                 
     return None  
 
@@ -197,7 +248,8 @@ def set_socket_type(ng, idx, in_out='OUTPUT', socket_type="NodeSocketFloat",):
     """set socket type via bpy.ops.node.tree_socket_change_type() with manual override, context MUST be the geometry node editor"""
 
     itm = get_socketui_from_socket_idx(ng, idx, in_out=in_out,)
-    itm.socket_type = socket_type
+    if (itm.socket_type!=socket_type):
+        itm.socket_type = socket_type
 
     return None
 
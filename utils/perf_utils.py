@@ -0,0 +1,311 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module record the time our add-on is costing, per handlers invocation and per node evaluation.
+#  the statistics are stored python side, they are not saved within the .blend.
+#  they can be queried from scripts, ex:
+#    from <addon>.utils.perf_utils import get_all_stats
+#    for (category, name), s in get_all_stats().items(): print(name, s['mean'], s['p95'])
+#  the same measures can also be written as a chrome trace-event json timeline (open it in chrome://tracing or ui.perfetto.dev)
+#    - interactively, from the 'Node Booster > Performance' panel.
+#    - from scripts, with start_trace(filepath) & stop_trace().
+#    - in background mode, set the 'NODEBOOSTER_TRACE' environment variable to a filepath before launching blender,
+#      the trace is written when blender exits. a '{pid}' in the path is replaced by the process id, ex:
+#      NODEBOOSTER_TRACE=/tmp/trace_{pid}.json blender -b file.blend -a
+
+
+import bpy
+
+import os, json, atexit, functools, threading
+from time import perf_counter
+from collections import deque
+
+
+STATS_HISTORY = 256 #rolling statistics are computed on the last N records
+STATS_REDRAW_INTERVAL = 0.25 #seconds between two redraws of the stats panel
+
+TRACE_ENVIRON_KEY = "NODEBOOSTER_TRACE"
+TRACE_MAX_EVENTS = 2_000_000 #we stop recording events past this limit, to avoid filling up the memory
+
+_IS_ENABLED = False
+_IS_TRACING = False
+_IS_ACTIVE = False #is anything recording? either the stats or the trace
+_TIMINGS = {} #{(category,name):deque(durations),}
+_COUNTS = {} #{(category,name):total_count,}
+_LAST_REDRAW = 0.0
+
+_TRACE_EVENTS = []
+_TRACE_FILEPATH = ""
+_TRACE_START = 0.0
+
+
+def is_stats_enabled() -> bool:
+    return _IS_ENABLED
+
+
+def set_stats_enabled(state:bool):
+    """enable or disable the recording of our timings"""
+
+    global _IS_ENABLED, _IS_ACTIVE
+    _IS_ENABLED = bool(state)
+    _IS_ACTIVE = _IS_ENABLED or _IS_TRACING
+
+    return None
+
+
+def is_tracing() -> bool:
+    return _IS_TRACING
+
+
+def get_trace_filepath() -> str:
+    return _TRACE_FILEPATH
+
+
+def start_trace(filepath:str):
+    """start recording a chrome trace-event timeline, it will be written to the given filepath on stop_trace()"""
+
+    global _IS_TRACING, _IS_ACTIVE, _TRACE_FILEPATH, _TRACE_START
+
+    _TRACE_EVENTS.clear()
+    _TRACE_FILEPATH = bpy.path.abspath(filepath).replace('{pid}', str(os.getpid()))
+    _TRACE_START = perf_counter()
+
+    _TRACE_EVENTS.append({
+        "name": "process_name", "ph": "M", "pid": os.getpid(),
+        "args": {"name": f"Blender {bpy.app.version_string} (Node Booster)"},
+        })
+
+    _IS_TRACING = True
+    _IS_ACTIVE = True
+
+    return None
+
+
+def stop_trace() -> str|None:
+    """stop recording and write the chrome trace-event json file, return the written filepath"""
+
+    global _IS_TRACING, _IS_ACTIVE
+
+    if (not _IS_TRACING):
+        return None
+
+    _IS_TRACING = False
+    _IS_ACTIVE = _IS_ENABLED
+
+    dirname = os.path.dirname(_TRACE_FILEPATH)
+    if (dirname):
+        os.makedirs(dirname, exist_ok=True)
+
+    with open(_TRACE_FILEPATH, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": _TRACE_EVENTS, "displayTimeUnit": "ms"}, f)
+
+    _TRACE_EVENTS.clear()
+
+    return _TRACE_FILEPATH
+
+
+def start_trace_from_environ():
+    """start a trace if requested from the environment variable, used for profiling background render jobs"""
+
+    filepath = os.environ.get(TRACE_ENVIRON_KEY)
+    if (filepath and not _IS_TRACING):
+        start_trace(filepath)
+        atexit.register(stop_trace)
+
+    return None
+
+
+def record_trace_event(category:str, name:str, start:float, duration:float, args:dict=None,):
+    """store a new complete event in our timeline, times are in seconds from perf_counter()"""
+
+    if (len(_TRACE_EVENTS) >= TRACE_MAX_EVENTS):
+        return None
+
+    event = {
+        "name": name,
+        "cat": category.lower(),
+        "ph": "X",
+        "ts": (start-_TRACE_START) * 1_000_000,
+        "dur": duration * 1_000_000,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        }
+    if (args):
+        event["args"] = args
+
+    _TRACE_EVENTS.append(event)
+
+    return None
+
+
+def clear_stats():
+    """forget about all recorded timings"""
+
+    _TIMINGS.clear()
+    _COUNTS.clear()
+
+    return None
+
+
+def get_node_stat_name(node) -> str:
+    """the name under which the timings of a node instance are stored"""
+    return f"{node.id_data.name} > {node.name}"
+
+
+def get_node_trace_args(node) -> dict:
+    """the arguments stored along the trace events of a node instance"""
+    return {"tree": node.id_data.name, "node": node.name, "type": node.bl_idname}
+
+
+def get_handler_trace_args() -> dict:
+    """the arguments stored along the trace events of our handlers, so we can see which frame blender was working on"""
+    scene = bpy.context.scene
+    return {"scene": scene.name, "frame": scene.frame_current, "subframe": scene.frame_subframe,}
+
+
+def tag_redraw_stats_panels():
+    """redraw the node editors sidebars, so our stats panel stay live during playback"""
+
+    global _LAST_REDRAW
+
+    now = perf_counter()
+    if ((now-_LAST_REDRAW) < STATS_REDRAW_INTERVAL):
+        return None
+    _LAST_REDRAW = now
+
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if (area.type=='NODE_EDITOR'):
+                area.tag_redraw()
+
+    return None
+
+
+def record_timing(category:str, name:str, duration:float):
+    """store a new duration, in seconds"""
+
+    key = (category, name)
+
+    timings = _TIMINGS.get(key)
+    if (timings is None):
+        timings = _TIMINGS[key] = deque(maxlen=STATS_HISTORY)
+        _COUNTS[key] = 0
+
+    timings.append(duration)
+    _COUNTS[key] += 1
+
+    if (category=='HANDLER'):
+        tag_redraw_stats_panels()
+
+    return None
+
+
+def get_stats(category:str, name:str) -> dict|None:
+    """get the rolling statistics of the given record, in seconds. {'count','mean','p95','max','last'}"""
+
+    key = (category, name)
+    timings = _TIMINGS.get(key)
+    if (not timings):
+        return None
+
+    ordered = sorted(timings)
+    n = len(ordered)
+
+    return {
+        'count': _COUNTS[key],
+        'mean': sum(ordered)/n,
+        'p95': ordered[int(0.95*(n-1))],
+        'max': ordered[-1],
+        'last': timings[-1],
+        }
+
+
+def get_all_stats(category:str=None) -> dict:
+    """get the rolling statistics of all records, optionally filter by 'HANDLER' or 'NODE' category. {(category,name):stats,}"""
+
+    return {key: get_stats(*key) for key in list(_TIMINGS.keys())
+            if (category is None) or (key[0]==category)}
+
+
+class _TimingSpan():
+    """context manager measuring the time spent within its block.
+    the trace event is named after 'label' if given, otherwise after 'name', optional 'args' are stored along the event"""
+
+    __slots__ = ('category', 'name', 'label', 'args', 'start',)
+
+    def __init__(self, category, name, label=None, args=None,):
+        self.category = category
+        self.name = name
+        self.label = label
+        self.args = args
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = perf_counter()-self.start
+        if (_IS_ENABLED):
+            record_timing(self.category, self.name, duration)
+        if (_IS_TRACING):
+            record_trace_event(self.category, self.label or self.name, self.start, duration, args=self.args,)
+        return False
+
+
+class _NullSpan():
+    """context manager doing nothing, when our timings are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULLSPAN = _NullSpan()
+
+
+def measure(category:str, name:str):
+    """context manager to record the time spent in a code block, ex: 'with measure('NODE', get_node_stat_name(n)):'"""
+
+    if (not _IS_ACTIVE):
+        return NULLSPAN
+
+    return _TimingSpan(category, name)
+
+
+def measure_node(node):
+    """context manager to record the time spent updating or evaluating a node instance"""
+
+    if (not _IS_ACTIVE):
+        return NULLSPAN
+
+    return _TimingSpan('NODE', get_node_stat_name(node), label="update", args=get_node_trace_args(node),)
+
+
+def timed(category:str):
+    """decorator to record the execution time of a function.
+    for the 'NODE' category, the function is expected to be a node method, timings are recorded per node instance.
+    NOTE don't use it on methods registered to blender (init, update, draw..), blender check their number of arguments."""
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if (not _IS_ACTIVE):
+                return func(*args, **kwargs)
+
+            if (category=='NODE'):
+                  span = _TimingSpan(category, get_node_stat_name(args[0]), label=func.__name__, args=get_node_trace_args(args[0]),)
+            else: span = _TimingSpan(category, func.__name__, args=get_handler_trace_args() if (_IS_TRACING) else None,)
+
+            with span:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
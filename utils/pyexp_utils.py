@@ -0,0 +1,477 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module hold what our Python Expression nodes need to evaluate the user expressions quickly.
+#  - the expressions are compiled a single time, the code objects are kept in a LRU cache shared by all nodes.
+#    the cache hits & misses are counted, see the 'Node Booster > Performance' panel.
+#  - the namespace of the modules available to the expressions is built a single time per session, and given to eval()
+#    as globals. the few names that change per evaluation ('scene', 'C', 'self'..) are given as a small locals dict,
+#    python resolves the locals first, then the globals.
+#  - optionally, the datablocks read by an expression are tracked, by wrapping 'bpy', 'D', 'C', 'scene' & 'self' in
+#    ReadProxy objects recording the IDs they access, so the node only needs to re-evaluate when one of these IDs is updated,
+#    or on frame changes if the expression reads the current frame or an animated ID. the tracking is conservative,
+#    objects with a parent, constraints or an armature, and the evaluated data (matrix_world, evaluated_get()..) are
+#    considered animated, they can change on frame changes through other IDs we don't track.
+#    reading the content of a collection (len, iteration, 'in', a lookup finding nothing..) depends on any ID of its
+#    items type, recorded as a (id_type, None) wildcard key, see get_collection_keys().
+#    a read we can't attribute to an ID (bpy.ops, bpy.app..) makes the read set unknown, re-evaluated on any update.
+#    the proxies pass isinstance() checks, but type() returns ReadProxy.
+#    the expressions are expected to be deterministic, ex: a 'random()' call won't be re-evaluated on each signal.
+#  - the expressions are also classified from the names they use, see get_expression_kind(). a pure math expression
+#    never needs to be evaluated again, an expression reading the frame only needs to on frame changes.
+
+
+import bpy
+
+import ast, math, random, mathutils
+from collections import OrderedDict
+
+from .depsgraph_utils import get_id_key
+from .registry_utils import get_node_key
+
+
+COMPILE_CACHE_MAX = 256 #maximal number of compiled expressions kept around
+
+_COMPILED = OrderedDict() #{expression:code,}
+_COMPILE_HITS = 0
+_COMPILE_MISSES = 0
+
+_STATIC_NAMESPACE = None
+
+FRAME_ATTRIBUTES = {'frame_current','frame_float','frame_subframe','frame_current_final'}
+EVALUATED_ATTRIBUTES = {
+    'matrix_world','matrix_local','bound_box','dimensions','pose','evaluated_get','evaluated_depsgraph_get',
+    'to_mesh','to_curve','ray_cast','closest_point_on_mesh',
+    }
+
+_READ_SETS = {} #{node_key:(frozenset(ids_keys),is_time_dependent,frozenset(wildcards_id_types)),}
+
+TRACKED_BPY_ATTRIBUTES = {'data','context','types'} #the other bpy modules reads can't be attributed to IDs
+ID_STRUCTS = {'VectorFont':'FONT', 'FreestyleLineStyle':'LINESTYLE', 'ParticleSettings':'PARTICLE',} #the ID structs not named after their id_type
+
+_ID_TYPES = {} #{struct identifier:id_type or None,}
+
+EXPRESSION_KINDS = ('CONSTANT','FRAME','SCENE','VOLATILE') #from the least to the most dependent
+PURE_BUILTINS = {
+    'abs','all','any','bin','bool','chr','complex','dict','divmod','enumerate','filter','float','format','frozenset',
+    'hex','int','isinstance','len','list','map','max','min','oct','ord','pow','range','reversed','round','set',
+    'slice','sorted','str','sum','tuple','zip',
+    }
+PURE_NAMES = PURE_BUILTINS | {n for m in (math, mathutils) for n in vars(m) if not n.startswith('_')}
+VOLATILE_NAMES = {n for n in vars(random) if not n.startswith('_')}
+FRAME_PATHS = {f"{root}.{attr}" for root in ('scene','C.scene','context.scene','bpy.context.scene') for attr in FRAME_ATTRIBUTES}
+
+_KINDS = {} #{expression:kind,}
+
+
+def expand_macros(expression:str) -> str:
+    """replace our macros by their python equivalent"""
+
+    if ('#frame' in expression):
+        expression = expression.replace('#frame','scene.frame_current')
+
+    return expression
+
+
+def get_compiled_expression(expression:str):
+    """return the code object of the given user expression, compiled a single time.
+    the expression is given before its macros expansion, raise SyntaxError if the expression is invalid"""
+
+    global _COMPILE_HITS, _COMPILE_MISSES
+
+    code = _COMPILED.get(expression)
+    if (code is not None):
+        _COMPILE_HITS += 1
+        _COMPILED.move_to_end(expression)
+        return code
+
+    _COMPILE_MISSES += 1
+    code = compile(expand_macros(expression), "<Python Expression>", 'eval')
+
+    _COMPILED[expression] = code
+    if (len(_COMPILED) > COMPILE_CACHE_MAX):
+        _COMPILED.popitem(last=False)
+
+    return code
+
+
+def get_dotted_path(node) -> str|None:
+    """return the 'a.b.c' path of the given ast attribute chain, None if it doesn't start from a name"""
+
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+
+    if not isinstance(node, ast.Name):
+        return None
+
+    parts.append(node.id)
+
+    return '.'.join(reversed(parts))
+
+
+def classify_expression(expression:str) -> str:
+    """classify the given user expression from the names it uses, return one of EXPRESSION_KINDS.
+    'CONSTANT' only use pure math functions, 'FRAME' also read the current frame, 'SCENE' read anything else,
+    'VOLATILE' use random functions, and needs to be evaluated on every signals"""
+
+    try:
+        tree = ast.parse(expand_macros(expression), mode='eval')
+    except SyntaxError:
+        return 'SCENE'
+
+    #the lambdas arguments & comprehensions variables are not read from the namespace
+    bound = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+    bound |= {a.arg for a in ast.walk(tree) if isinstance(a, ast.arg)}
+
+    rank = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+
+        if isinstance(node, ast.Attribute):
+            path = get_dotted_path(node)
+            if (path in FRAME_PATHS):
+                rank = max(rank, 1)
+                continue
+            if (path is not None) and path.startswith('noise.random'):
+                rank = 3
+
+        elif isinstance(node, ast.Name) and (node.id not in bound):
+            if (node.id in VOLATILE_NAMES):
+                rank = 3
+            elif (node.id not in PURE_NAMES):
+                rank = max(rank, 2)
+
+        stack.extend(ast.iter_child_nodes(node))
+
+    return EXPRESSION_KINDS[rank]
+
+
+def get_expression_kind(expression:str) -> str:
+    """return the kind of the given user expression, classified a single time"""
+
+    kind = _KINDS.get(expression)
+    if (kind is None):
+        if (len(_KINDS) >= COMPILE_CACHE_MAX):
+            _KINDS.clear()
+        kind = _KINDS[expression] = classify_expression(expression)
+
+    return kind
+
+
+def get_static_namespace() -> dict:
+    """return the names available to all expressions, built a single time"""
+
+    global _STATIC_NAMESPACE
+
+    if (_STATIC_NAMESPACE is None):
+        namespace = {}
+        namespace["bpy"] = bpy
+        namespace.update(vars(__import__('random')))
+        namespace.update(vars(__import__('mathutils')))
+        namespace.update(vars(__import__('math')))
+        _STATIC_NAMESPACE = namespace
+
+    return _STATIC_NAMESPACE
+
+
+def get_compile_cache_stats() -> dict:
+    """return the number of compiled expressions cached, and the cache hits & misses counts"""
+
+    return {
+        'size': len(_COMPILED),
+        'hits': _COMPILE_HITS,
+        'misses': _COMPILE_MISSES,
+        }
+
+
+def clear_compile_cache_stats():
+    """reset the cache hits & misses counts"""
+
+    global _COMPILE_HITS, _COMPILE_MISSES
+    _COMPILE_HITS = 0
+    _COMPILE_MISSES = 0
+
+    return None
+
+
+def clear_compile_cache():
+    """forget about all compiled expressions"""
+
+    _COMPILED.clear()
+    clear_compile_cache_stats()
+
+    return None
+
+
+def get_struct_id_type(struct) -> str|None:
+    """return the id_type of the IDs described by the given RNA struct, None if it's not an ID struct"""
+
+    identifier = struct.identifier
+    if (identifier in _ID_TYPES):
+        return _ID_TYPES[identifier]
+
+    base = struct
+    while (base is not None) and (base.identifier!='ID'):
+        base = base.base
+
+    id_type = None
+    if (base is not None):
+        id_type = ID_STRUCTS.get(identifier)
+        if (id_type is None):
+            for item in bpy.types.ID.bl_rna.properties['id_type'].enum_items:
+                if (item.name.replace(' ','').lower()==identifier.lower()):
+                    id_type = item.identifier
+                    break
+
+    _ID_TYPES[identifier] = id_type
+
+    return id_type
+
+
+def get_collection_keys(owner, name:str, collection) -> tuple|None:
+    """return the keys the content of the given collection, read as owner.name, depends on. None if unknown.
+    a collection of IDs depends on any ID of its items type, a (id_type, None) wildcard key,
+    the other collections are owned by an ID, updated when they are edited"""
+
+    prop = owner.bl_rna.properties.get(name) if isinstance(owner, bpy.types.bpy_struct) else None
+    if (prop is not None) and (prop.type=='COLLECTION'):
+        id_type = get_struct_id_type(prop.fixed_type)
+        if (id_type is not None):
+            return ((id_type, None),)
+
+    idb = collection.id_data
+    if (idb is not None):
+        return (get_id_key(idb.original),)
+
+    return None
+
+
+class ReadTracker:
+    """gather the IDs keys read by an expression, through the ReadProxy objects it created"""
+
+    def __init__(self):
+        self.ids = set()
+        self.is_time_dependent = False
+        self.is_unknown = False
+
+    def record(self, value):
+        """record the ID owning the given blender struct, if it's one"""
+
+        if not isinstance(value, bpy.types.bpy_struct):
+            return None
+
+        idb = value if isinstance(value, bpy.types.ID) else value.id_data
+        if (idb is None):
+            return None
+
+        self.ids.add(get_id_key(idb.original))
+
+        #animated values change on frame change, without depsgraph updates
+        anim = getattr(idb, 'animation_data', None)
+        if (anim is not None) and ((anim.action is not None) or len(anim.drivers)):
+            self.is_time_dependent = True
+
+        #these objects might be moved by other animated objects
+        elif isinstance(idb, bpy.types.Object) and ((idb.parent is not None) or len(idb.constraints) or (idb.type=='ARMATURE')):
+            self.is_time_dependent = True
+
+        return None
+
+    def record_collection(self, keys):
+        """record a read of the content of a collection, its items added, removed or renamed, see get_collection_keys()"""
+
+        if (keys is None):
+              self.is_unknown = True
+        else: self.ids.update(keys)
+
+        return None
+
+    def wrap(self, value, keys=None,):
+        """wrap the bpy module, blender structs, collections & functions in a ReadProxy, the items of lists & tuples too,
+        other values are returned as is. a struct is recorded once its content is accessed.
+        the given keys are the keys of a collection, or of the collection a method belongs to, see get_collection_keys()"""
+
+        if (value is bpy) or isinstance(value, (bpy.types.bpy_struct, bpy.types.bpy_prop_collection)) or callable(value):
+            return ReadProxy(value, self, keys)
+
+        if (type(value) in (list, tuple)):
+            return type(value)(self.wrap(v) for v in value)
+
+        return value
+
+
+def unwrap(value):
+    """get the original value of a ReadProxy, also unwrap the items of lists, tuples & sets"""
+
+    if isinstance(value, ReadProxy):
+        return value._value
+
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(unwrap(v) for v in value)
+
+    return value
+
+
+class ReadProxy:
+    """forward any access to the wrapped value, and record the IDs read to its ReadTracker"""
+
+    __slots__ = ('_value', '_tracker', '_keys')
+
+    def __init__(self, value, tracker, keys=None,):
+        self._value = value
+        self._tracker = tracker
+        self._keys = keys
+
+    @property
+    def __class__(self):
+        #isinstance() checks fall back on __class__, type() can't be fooled
+        return self._value.__class__
+
+    def __getattr__(self, name):
+
+        if (name in FRAME_ATTRIBUTES) or (name in EVALUATED_ATTRIBUTES):
+            self._tracker.is_time_dependent = True
+
+        #bpy.ops, bpy.app.. can read or change anything
+        if (self._value is bpy):
+            if (name not in TRACKED_BPY_ATTRIBUTES):
+                self._tracker.is_unknown = True
+            return self._tracker.wrap(getattr(bpy, name))
+
+        #the context attributes depend on the active scene & view layer
+        if isinstance(self._value, bpy.types.Context):
+              self._tracker.record(self._value.scene)
+        else: self._tracker.record(self._value)
+
+        value = getattr(self._value, name)
+
+        #the collections methods share the keys of their collection
+        if isinstance(self._value, bpy.types.bpy_prop_collection):
+            return self._tracker.wrap(value, self._keys)
+        if isinstance(value, bpy.types.bpy_prop_collection):
+            return self._tracker.wrap(value, get_collection_keys(self._value, name, value))
+
+        #the IDs listed by a python property, ex: 'children', depend on any ID of their type
+        if (type(value) in (list, tuple)) and (not isinstance(self._value, bpy.types.Context)):
+            self._tracker.record_collection(get_items_keys(value))
+
+        return self._tracker.wrap(value)
+
+    def __getitem__(self, key):
+
+        key = unwrap(key)
+        value = self._value[key]
+
+        #the items found by name only depend on themselves, not their position
+        if isinstance(self._value, bpy.types.bpy_prop_collection):
+            if isinstance(key, str):
+                  self._tracker.record(value)
+            else: self._tracker.record_collection(self._keys)
+
+        #ID custom properties
+        else: self._tracker.record(self._value)
+
+        return self._tracker.wrap(value)
+
+    def __call__(self, *args, **kwargs):
+
+        value = self._value(*[unwrap(a) for a in args], **{k:unwrap(v) for k,v in kwargs.items()})
+
+        #a collection lookup finding nothing, or listing its items, depends on its whole content
+        if isinstance(getattr(self._value, '__self__', None), bpy.types.bpy_prop_collection) \
+            and not isinstance(value, bpy.types.bpy_struct):
+            self._tracker.record_collection(self._keys)
+
+        return self._tracker.wrap(value)
+
+    def _record_content(self):
+        """record a read of the whole content of the wrapped value"""
+
+        if isinstance(self._value, bpy.types.bpy_prop_collection):
+              self._tracker.record_collection(self._keys)
+        else: self._tracker.record(self._value)
+
+        return None
+
+    def __iter__(self):
+        self._record_content()
+        return (self._tracker.wrap(v) for v in self._value)
+
+    def __len__(self):
+        self._record_content()
+        return len(self._value)
+
+    def __contains__(self, item):
+        self._record_content()
+        return unwrap(item) in self._value
+
+    def __bool__(self):
+        return bool(self._value)
+
+    def __eq__(self, other):
+        return self._value == unwrap(other)
+
+    def __ne__(self, other):
+        return self._value != unwrap(other)
+
+    def __hash__(self):
+        return hash(self._value)
+
+    def __repr__(self):
+        return repr(self._value)
+
+    def __str__(self):
+        return str(self._value)
+
+
+def get_items_keys(items) -> tuple|None:
+    """return the wildcard keys of the IDs types of the given items, None if they are not all IDs, see get_collection_keys()"""
+
+    if (not items) or (not all(isinstance(v, bpy.types.ID) for v in items)):
+        return None
+
+    return tuple({(v.id_type, None) for v in items})
+
+
+def set_read_set(node, tracker):
+    """store the IDs read by the last evaluation of the given node, or forget about them if tracker is None.
+    a tracker who met a read it couldn't attribute leaves the read set unknown"""
+
+    if (tracker is None) or (tracker.is_unknown):
+        _READ_SETS.pop(get_node_key(node), None)
+        return None
+
+    wildcards = frozenset(k[0] for k in tracker.ids if (k[1] is None))
+    _READ_SETS[get_node_key(node)] = (frozenset(tracker.ids), tracker.is_time_dependent, wildcards)
+
+    return None
+
+
+def get_read_set(node) -> tuple|None:
+    """return the (IDs keys, is_time_dependent, wildcards id_types) read by the last evaluation of the given node, None if unknown"""
+    return _READ_SETS.get(get_node_key(node))
+
+
+def is_read_set_updated(read_set, updated_ids) -> bool:
+    """check if any of the updated IDs keys was read, directly or through a collection wildcard key"""
+
+    if (not read_set[0].isdisjoint(updated_ids)):
+        return True
+
+    wildcards = read_set[2]
+    if (wildcards):
+        return any((k[0] in wildcards) for k in updated_ids)
+
+    return False
+
+
+def clear_read_sets():
+    """forget about all read sets"""
+
+    _READ_SETS.clear()
+
+    return None
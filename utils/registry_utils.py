@@ -0,0 +1,105 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module keep track of our booster nodes instances, so our handlers don't need to scan
+#  every nodes of every node_groups on each depsgraph or frame signals.
+#  - the registry is filled from our nodes 'init' 'copy' & 'free' callbacks.
+#  - it is rebuilt lazily from a full scan when tagged dirty (on file load, undo, or when it went out of sync).
+#  - we store names instead of nodes python objects, these are not safe to keep around between signals.
+#    the node_groups are identified by their name_full, a local & a linked nodegroup can share the same name.
+
+
+import bpy
+
+from .depsgraph_utils import get_id_from_name_full
+
+
+_REGISTRY = {} #{bl_idname:{(node_tree.name_full, node.name),},}
+_IS_DIRTY = True
+_NG_COUNT = -1
+
+
+def get_node_key(node) -> tuple:
+    """return a hashable key identifying the given node instance"""
+    return (node.id_data.name_full, node.name)
+
+
+def tag_registry_dirty():
+    """the registry will be rebuilt from a full scan on next access"""
+
+    global _IS_DIRTY
+    _IS_DIRTY = True
+
+    return None
+
+
+def rebuild_registry():
+    """scan all node_groups a single time and gather our booster nodes instances"""
+
+    global _IS_DIRTY, _NG_COUNT
+
+    _REGISTRY.clear()
+    for ng in bpy.data.node_groups:
+        for n in ng.nodes:
+            if ('NodeBooster' in n.bl_idname):
+                _REGISTRY.setdefault(n.bl_idname, set()).add((ng.name_full, n.name))
+
+    _IS_DIRTY = False
+    _NG_COUNT = len(bpy.data.node_groups)
+
+    return None
+
+
+def register_instance(node):
+    """add a node instance to the registry, run from the node 'init' callback"""
+
+    if (not _IS_DIRTY):
+        _REGISTRY.setdefault(node.bl_idname, set()).add(get_node_key(node))
+
+    return None
+
+
+def unregister_instance(node):
+    """remove a node instance from the registry, run from the node 'free' callback"""
+
+    instances = _REGISTRY.get(node.bl_idname)
+    if (instances):
+        instances.discard(get_node_key(node))
+
+    return None
+
+
+def _resolve_instances(bl_idname):
+    """get the nodes from their registry keys, return None if the registry is out of sync"""
+
+    node_groups = bpy.data.node_groups
+    instances = []
+
+    for ng_name, node_name in _REGISTRY.get(bl_idname, ()):
+        ng = get_id_from_name_full(node_groups, ng_name)
+        if (ng is None):
+            return None
+        n = ng.nodes.get(node_name)
+        if (n is None) or (n.bl_idname!=bl_idname):
+            return None
+        instances.append(n)
+
+    return instances
+
+
+def get_all_instances(bl_idname) -> list:
+    """return all live node instances of the given booster node type"""
+
+    # a nodegroup appended/linked/removed won't go through our nodes callbacks
+    if (_IS_DIRTY or (_NG_COUNT!=len(bpy.data.node_groups))):
+        rebuild_registry()
+
+    instances = _resolve_instances(bl_idname)
+
+    # a node or nodegroup might have been renamed or removed, we need to rebuild
+    if (instances is None):
+        rebuild_registry()
+        instances = _resolve_instances(bl_idname) or []
+
+    return instances
@@ -0,0 +1,267 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module index the sound strips of the video sequencer by time, so finding the strips playing at a given
+#  frame doesn't require to walk all strips of the edit.
+#  - the timeline is cut at every strip start & end, for each of these boundaries and for each span between them,
+#    we store the names of the unmuted sound strips playing. a query is then a binary search.
+#  - the index is rebuilt lazily, after the scene was updated, see invalidate_strips_index().
+#  - like our nodes registry, we store strips names, strips python objects are not safe to keep around.
+#  - the animated volume of the strips, their fades, are sampled once per frame over the strip duration, so reading
+#    them doesn't require to evaluate an FCurve per strip per frame. rebuilt when the strips or the scene action are updated.
+#    the sampled volumes are also multiplied into the sounds envelopes once per strip, see get_faded_envelope_value().
+#  - the strips are not IDs, editing them only tags their scene for an update, and the scene is tagged on almost any edit.
+#    we compare the strips settings when the scene is updated, and add a ('SEQUENCER', scene.name_full) key to the
+#    updated IDs keys only if they changed, see tag_strips_updates().
+
+
+import bpy
+
+import numpy
+from bisect import bisect_left, bisect_right
+
+from .depsgraph_utils import get_id_key
+
+
+_INDEXES = {} #{scene_key:{'bounds','spans','points','starts','starts_names','action_key'},}
+_VOLUMES = {} #{scene_key:{strip_name:(frame_start,volumes_array) or None,},}
+_SIGNATURES = {} #{scene_key:hash of the sound strips settings,}
+_FADED = {} #{scene_key:{(strip_name, id(envelope)):(envelope, frame_start, faded_array),},} the envelope is kept, so its id can't be reused
+
+FADED_MAX = 64 #maximal number of faded envelopes kept per scene
+
+
+def build_strips_index(scene) -> dict:
+    """index the unmuted sound strips of the given scene by time"""
+
+    strips = []
+    if (scene.sequence_editor is not None):
+        for s in scene.sequence_editor.sequences_all:
+            if (s.type=='SOUND') and (not s.mute) and (s.sound is not None):
+                strips.append((s.frame_final_start, s.frame_final_end, s.name))
+
+    bounds = sorted({f for start, end, _ in strips for f in (start, end)})
+    starting = {b:[] for b in bounds}
+    for start, end, name in strips:
+        starting[start].append((end, name))
+
+    #sweep the boundaries, 'spans[i]' are the strips playing between bounds[i] & bounds[i+1],
+    # 'points[i]' are the strips playing exactly on bounds[i] (starting and ending frames are excluded)
+    spans, points = [], []
+    active = []
+    for b in bounds:
+        active = [(end, name) for end, name in active if (end>b)]
+        points.append([name for _, name in active])
+        active += starting[b]
+        spans.append([name for _, name in active])
+
+    strips.sort()
+
+    #editing the strips fades only update the scene action
+    action = scene.animation_data.action if (scene.animation_data is not None) else None
+
+    return {
+        'bounds': bounds,
+        'spans': spans,
+        'points': points,
+        'starts': [start for start, _, _ in strips],
+        'starts_names': [name for _, _, name in strips],
+        'action_key': get_id_key(action) if (action is not None) else None,
+        }
+
+
+def get_strips_index(scene) -> dict:
+    """return the index of the given scene, built lazily"""
+
+    key = get_id_key(scene)
+
+    index = _INDEXES.get(key)
+    if (index is None):
+        index = _INDEXES[key] = build_strips_index(scene)
+        _SIGNATURES[key] = get_strips_signature(scene)
+
+    return index
+
+
+def get_strips_from_names(scene, names) -> list:
+    """get the strips python objects from their names"""
+
+    if (scene.sequence_editor is None):
+        return []
+
+    sequences = scene.sequence_editor.sequences_all
+    strips = [sequences.get(name) for name in names]
+
+    return [s for s in strips if (s is not None)]
+
+
+def get_active_sound_strips(scene, frame:float,) -> list:
+    """return the unmuted sound strips playing at the given frame, starting and ending frames excluded"""
+
+    index = get_strips_index(scene)
+    bounds = index['bounds']
+
+    i = bisect_right(bounds, frame) - 1
+    if (i < 0):
+        return []
+
+    names = index['points'][i] if (bounds[i]==frame) else index['spans'][i]
+
+    return get_strips_from_names(scene, names)
+
+
+def get_nearby_sound_strips(scene, frame:float, horizon:float,) -> list:
+    """return the unmuted sound strips starting within the given number of frames, before or after the given frame"""
+
+    index = get_strips_index(scene)
+    starts = index['starts']
+
+    i = bisect_left(starts, frame-horizon)
+    j = bisect_right(starts, frame+horizon)
+
+    return get_strips_from_names(scene, index['starts_names'][i:j])
+
+
+def get_volume_fcurve(scene, strip):
+    """return the FCurve animating the volume of the given strip, if any"""
+
+    if (scene.animation_data is None) or (scene.animation_data.action is None):
+        return None
+
+    return scene.animation_data.action.fcurves.find(f'sequence_editor.sequences_all["{strip.name}"].volume')
+
+
+def sample_strip_volume(scene, strip) -> tuple|None:
+    """sample the animated volume of the given strip on each frame of its duration, None if not animated.
+    blender can't evaluate an FCurve on many frames at once, but it's only done once per strip, see get_sampled_volume()"""
+
+    fcurve = get_volume_fcurve(scene, strip)
+    if (fcurve is None):
+        return None
+
+    start, end = int(strip.frame_final_start), int(strip.frame_final_end)
+    volumes = numpy.fromiter((fcurve.evaluate(f) for f in range(start, end+1)), dtype=numpy.float32, count=end-start+1,)
+
+    return (start, volumes)
+
+
+def get_sampled_volume(scene, strip) -> tuple|None:
+    """return the (frame_start, volumes_array) sampled from the animated volume of the given strip, None if not animated"""
+
+    #the index holds the action key our sampled volumes are invalidated with
+    get_strips_index(scene)
+
+    volumes = _VOLUMES.setdefault(get_id_key(scene), {})
+    if (strip.name not in volumes):
+        volumes[strip.name] = sample_strip_volume(scene, strip)
+
+    return volumes[strip.name]
+
+
+def get_strip_volume(scene, strip, frame:float,) -> float:
+    """return the volume of the given strip at the given frame, its fades included"""
+
+    sampled = get_sampled_volume(scene, strip)
+    if (sampled is None):
+        return strip.volume
+
+    start, array = sampled
+    index = min(max(round(frame)-start, 0), len(array)-1)
+
+    return float(array[index])
+
+
+def get_faded_envelope_value(scene, strip, envelope, frame:float,) -> float|None:
+    """return the level of the given strip sound envelope at the given whole frame, multiplied by its animated volume.
+    the envelope is multiplied by the sampled volumes a single time per strip, None if the volume is not animated"""
+
+    sampled = get_sampled_volume(scene, strip)
+    if (sampled is None):
+        return None
+
+    faded = _FADED.setdefault(get_id_key(scene), {})
+    key = (strip.name, id(envelope))
+
+    cached = faded.get(key)
+    if (cached is None):
+        start, volumes = sampled
+
+        #the envelope index of each frame of the strip, the sound heard on frame f is the level between f-1 & f
+        indexes = numpy.rint(numpy.arange(start, start+len(volumes)) - 1 - strip.frame_start).astype(numpy.int64)
+        levels = numpy.zeros(len(volumes), dtype=numpy.float32)
+        valid = (indexes>=0) & (indexes<len(envelope))
+        levels[valid] = envelope[indexes[valid]]
+
+        if (len(faded) >= FADED_MAX):
+            faded.clear()
+        cached = faded[key] = (envelope, start, levels * volumes)
+
+    _, start, array = cached
+    index = min(max(round(frame)-start, 0), len(array)-1)
+
+    return float(array[index])
+
+
+def get_strips_key(scene) -> tuple:
+    """the key standing for the sound strips of the given scene in the updated IDs keys, see tag_strips_updates()"""
+    return ('SEQUENCER', scene.name_full)
+
+
+def get_strips_signature(scene) -> int:
+    """hash the settings of the sound strips of the given scene. the volumes animated by the scene action are
+    excluded, they vary from frame to frame, the action updates are tracked on their own"""
+
+    if (scene.sequence_editor is None):
+        return hash((scene.render.fps, scene.render.fps_base))
+
+    action = scene.animation_data.action if (scene.animation_data is not None) else None
+    animated = {fc.data_path for fc in action.fcurves} if (action is not None) else set()
+
+    return hash((scene.render.fps, scene.render.fps_base, *(
+        (s.name, s.channel, s.mute, s.frame_final_start, s.frame_final_end, s.frame_start,
+         s.sound.name_full if (s.sound) else None,
+         None if (f'sequence_editor.sequences_all["{s.name}"].volume' in animated) else s.volume,)
+        for s in scene.sequence_editor.sequences_all if (s.type=='SOUND')
+        )))
+
+
+def tag_strips_updates(updated_ids):
+    """add the strips key of the updated scenes whose sound strips changed to the given updated IDs keys"""
+
+    for scene in bpy.data.scenes:
+        key = get_id_key(scene)
+        if (key not in updated_ids):
+            continue
+        signature = get_strips_signature(scene)
+        if (_SIGNATURES.get(key)!=signature):
+            _SIGNATURES[key] = signature
+            updated_ids.add(get_strips_key(scene))
+
+    return None
+
+
+def invalidate_strips_index(updated_ids):
+    """forget about the indexes & sampled volumes of the scenes whose strips or action were updated, see tag_strips_updates()"""
+
+    for key in [k for k,v in _INDEXES.items() if (('SEQUENCER', k[1]) in updated_ids) or (v['action_key'] in updated_ids)]:
+        del _INDEXES[key]
+        _VOLUMES.pop(key, None)
+        _FADED.pop(key, None)
+
+    for key in [k for k in _VOLUMES if (('SEQUENCER', k[1]) in updated_ids)]:
+        del _VOLUMES[key]
+        _FADED.pop(key, None)
+
+    return None
+
+
+def clear_strips_index():
+    """forget about all indexes & sampled volumes"""
+
+    _INDEXES.clear()
+    _VOLUMES.clear()
+    _SIGNATURES.clear()
+    _FADED.clear()
+
+    return None
@@ -0,0 +1,153 @@
+# SPDX-FileCopyrightText: 2025 BD3D DIGITAL DESIGN (Dorian B.)
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+# NOTE this module keep a reverse index of which objects are using which geometry node_groups, through their
+#  modifiers, directly or nested in other node_groups. ex: the Python Expression node 'self' need to find its object.
+#  - it is rebuilt lazily from a full scan when tagged dirty (on file load, undo, or after a modifier or a nodegroup changed).
+#  - like our nodes registry, we store name_full, objects python objects are not safe to keep around between signals.
+#  - we also index which node_groups contain which node_groups, to find what our nodes writing their outputs values
+#    will tag for an update, see get_own_writes_consequences().
+
+
+import bpy
+
+from .depsgraph_utils import is_booster_nodegroup, get_id_key, get_id_from_name_full, pop_own_writes
+
+
+_USERS = {} #{node_group.name_full:{object.name_full,},}
+_PARENTS = {} #{node_group.name_full:{parent node_group.name_full,},}
+_IS_DIRTY = True
+_OBJ_COUNT = -1
+
+
+def tag_users_index_dirty():
+    """the index will be rebuilt from a full scan on next access"""
+
+    global _IS_DIRTY
+    _IS_DIRTY = True
+
+    return None
+
+
+def tag_users_index_from_depsgraph(depsgraph, updated_ids,):
+    """tag the index dirty if the given depsgraph updated a modifier or a nodegroup.
+    only the given relevant updated IDs keys are considered, see get_updated_ids()"""
+
+    if (_IS_DIRTY):
+        return None
+
+    for update in depsgraph.updates:
+        idb = update.id.original
+        if (get_id_key(idb) not in updated_ids):
+            continue
+        match idb.id_type:
+            case 'OBJECT':
+                #modifiers changes are geometry updates, we ignore transforms
+                if (update.is_updated_geometry):
+                    tag_users_index_dirty()
+                    return None
+            case 'NODETREE':
+                if (not is_booster_nodegroup(idb)):
+                    tag_users_index_dirty()
+                    return None
+
+    return None
+
+
+def get_nested_nodegroups(ng, nested=None,) -> set:
+    """return the name_full of the given nodegroup and of all the nodegroups nested in it"""
+
+    if (nested is None):
+        nested = set()
+
+    nested.add(ng.name_full)
+    for n in ng.nodes:
+        sub = getattr(n, 'node_tree', None)
+        if (sub is None) or (sub.name_full in nested) or is_booster_nodegroup(sub):
+            continue
+        get_nested_nodegroups(sub, nested)
+
+    return nested
+
+
+def rebuild_users_index():
+    """scan all objects modifiers a single time and gather the nodegroups they use"""
+
+    global _IS_DIRTY, _OBJ_COUNT
+
+    _USERS.clear()
+    _PARENTS.clear()
+    nested_cache = {}
+
+    for ng in bpy.data.node_groups:
+        for n in ng.nodes:
+            sub = getattr(n, 'node_tree', None)
+            if (sub is not None):
+                _PARENTS.setdefault(sub.name_full, set()).add(ng.name_full)
+
+    for o in bpy.data.objects:
+        for m in o.modifiers:
+            if (m.type=='NODES' and m.node_group):
+                nested = nested_cache.get(m.node_group.name_full)
+                if (nested is None):
+                    nested = nested_cache[m.node_group.name_full] = get_nested_nodegroups(m.node_group)
+                for name in nested:
+                    _USERS.setdefault(name, set()).add(o.name_full)
+
+    _IS_DIRTY = False
+    _OBJ_COUNT = len(bpy.data.objects)
+
+    return None
+
+
+def get_nodegroup_users(ng) -> set:
+    """return the objects using the given nodegroup in their modifiers, directly or nested in other nodegroups"""
+
+    # an object added/removed might not send us a geometry update
+    if (_IS_DIRTY or (_OBJ_COUNT!=len(bpy.data.objects))):
+        rebuild_users_index()
+
+    objects = bpy.data.objects
+    users = set()
+
+    for name in _USERS.get(ng.name_full, ()):
+        o = get_id_from_name_full(objects, name)
+        # an object might have been renamed, we need to rebuild
+        if (o is None):
+            rebuild_users_index()
+            return get_nodegroup_users(ng)
+        users.add(o)
+
+    return users
+
+
+def get_own_writes_consequences() -> set:
+    """return the keys of the IDs blender will tag for an update because our nodes wrote their outputs values
+    since the last call: the node_groups containing the written booster nodegroups, directly or nested,
+    and the objects using these node_groups"""
+
+    written = pop_own_writes()
+    if (not written):
+        return set()
+
+    if (_IS_DIRTY or (_OBJ_COUNT!=len(bpy.data.objects))):
+        rebuild_users_index()
+
+    consequences = set()
+
+    #climb up the node_groups containing our nodegroups
+    parents, stack = set(), list(written)
+    while stack:
+        for name in _PARENTS.get(stack.pop(), ()):
+            if (name not in parents):
+                parents.add(name)
+                stack.append(name)
+
+    #the keys are (id_type, name_full), see get_id_key()
+    for name in parents:
+        consequences.add(('NODETREE', name))
+        for oname in _USERS.get(name, ()):
+            consequences.add(('OBJECT', oname))
+
+    return consequences